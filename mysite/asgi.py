@@ -2,6 +2,10 @@
 ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn mysite.asgi:application``) so the
+live results streams of polls are held open without a thread each. The
+polls pages are served by their async views here unless POLLS_ASYNC_VIEWS
+is set to False.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -12,5 +16,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+os.environ.setdefault('POLLS_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
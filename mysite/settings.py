@@ -11,8 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
-import os, os.path
+from decouple import Csv, config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,9 +25,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = config('DEBUG', default=True)
+DEBUG = config('DEBUG', default=True, cast=bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=Csv())
 
 
 
@@ -45,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,12 +56,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'mysite.urls'
 
+# Outside DEBUG templates are compiled once per process and kept by the
+# cached loader.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
+        # the Django backend, with render times reported to polls.metrics
+        'BACKEND': 'polls.metrics.TimedDjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -78,15 +86,182 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# DB_PROFILE picks one of DATABASE_PROFILES:
+# sqlite   - single node, SQLite in WAL mode with persistent connections
+# postgres - several nodes sharing one PostgreSQL database (needs psycopg2)
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'mysite.backends.sqlite3',
+        'NAME': config('SQLITE_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+                'mmap_size': config('SQLITE_MMAP_SIZE', default=64 * 1024 * 1024, cast=int),
+            },
+        },
+        # a file, so tests can run concurrent connections against it
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_NAME', default='kupolls'),
+        'USER': config('DB_USER', default='kupolls'),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': DATABASE_PROFILES[config('DB_PROFILE', default='sqlite')],
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# CACHE_BACKEND is one of locmem (default), file or db. The db backend
+# needs its table created once with "python manage.py createcachetable".
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ku-polls',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': config('CACHE_LOCATION', default='polls_cache'),
+    },
 }
+
+CACHES = {
+    'default': CACHE_BACKENDS[config('CACHE_BACKEND', default='locmem')],
+}
+
+# Vote changes between nodes
+# POLLS_PUBSUB is one of local (default, one process), sqlite (processes
+# sharing a host and POLLS_PUBSUB_LOCATION, a SQLite file) or redis (nodes
+# sharing the Redis server at POLLS_PUBSUB_LOCATION). Every node's live
+# streams, and its results cache if that is locmem, follow the votes cast
+# on the others.
+
+POLLS_PUBSUB_BACKENDS = {
+    'local': ('polls.backends.local.LocalBackend', {}),
+    'sqlite': ('polls.backends.sqlite.SQLiteBackend',
+               {'path': config('POLLS_PUBSUB_LOCATION', default=str(BASE_DIR / 'pubsub.sqlite3'))}),
+    'redis': ('polls.backends.redis.RedisBackend',
+              {'url': config('POLLS_PUBSUB_LOCATION', default='redis://localhost:6379/0')}),
+}
+
+POLLS_PUBSUB_BACKEND, POLLS_PUBSUB_OPTIONS = POLLS_PUBSUB_BACKENDS[config('POLLS_PUBSUB', default='local')]
+
+# Sessions
+# SESSION_STORE is one of db (default), cached_db, cache or signed_cookies.
+# cache and signed_cookies read no session row per request; cache sessions
+# only survive as long as the cache, so use a shared cache with them.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSION_ENGINE = SESSION_ENGINES[config('SESSION_STORE', default='db')]
+
+# seconds a logged in user is served from the cache by
+# polls.auth.CachedModelBackend, 0 reads it from the database every request.
+# With several nodes use a shared cache (CACHE_BACKEND file or db) or set 0:
+# with locmem a deactivation or password change on one node is not seen by
+# the others until their copy expires.
+POLLS_USER_CACHE_TIMEOUT = config('POLLS_USER_CACHE_TIMEOUT', default=300, cast=int)
+
+# seconds a question's tallies stay cached; votes refresh them right away
+POLLS_RESULTS_CACHE_TIMEOUT = config('POLLS_RESULTS_CACHE_TIMEOUT', default=300, cast=int)
+
+# number of polls listed per page of the polls index
+POLLS_INDEX_PAGE_SIZE = config('POLLS_INDEX_PAGE_SIZE', default=20, cast=int)
+
+# seconds a rendered page or fragment stays cached; changes expire it sooner
+POLLS_PAGE_CACHE_TIMEOUT = config('POLLS_PAGE_CACHE_TIMEOUT', default=60, cast=int)
+
+# seconds between keepalive comments on an idle live results stream
+POLLS_STREAM_KEEPALIVE = config('POLLS_STREAM_KEEPALIVE', default=15, cast=int)
+
+# queries a request may run before a warning is logged, by URL name
+POLLS_QUERY_BUDGET = config('POLLS_QUERY_BUDGET', default=10, cast=int)
+POLLS_QUERY_BUDGETS = {
+    'polls:resultData': 2,
+    # a new vote (measured): session, user, question, choice, begin, locked
+    # vote, its insert in a savepoint (3), counter, vote event, commit, fresh
+    # tallies; a changed vote runs 11. Timeline buckets are filled off this path.
+    'polls:vote': 13,
+    # question, choices, two bucket reads and the check for unfolded events;
+    # a read that folds new events first runs up to 13
+    'polls:timelineData': 13,
+}
+
+# Vote ingestion
+# With POLLS_VOTE_INGEST on, votes are queued in process and written in
+# batches of up to POLLS_VOTE_BATCH_SIZE every POLLS_VOTE_FLUSH_INTERVAL seconds.
+
+POLLS_VOTE_INGEST = config('POLLS_VOTE_INGEST', default=False, cast=bool)
+POLLS_VOTE_BATCH_SIZE = config('POLLS_VOTE_BATCH_SIZE', default=200, cast=int)
+POLLS_VOTE_FLUSH_INTERVAL = config('POLLS_VOTE_FLUSH_INTERVAL', default=0.5, cast=float)
+
+# Votes are limited per user and per IP address by token buckets holding
+# up to *_BURST votes and refilled at *_RATE votes per second. The same vote
+# submitted again within POLLS_REPEAT_VOTE_TIMEOUT seconds is not processed.
+# The IP limit is off by default: behind a load balancer or a NAT every voter
+# shares one REMOTE_ADDR. Set POLLS_VOTE_IP_RATE_LIMITER to
+# polls.ratelimit.CacheTokenBucket where clients connect directly.
+POLLS_VOTE_RATE_LIMITER = config('POLLS_VOTE_RATE_LIMITER', default='polls.ratelimit.CacheTokenBucket')
+POLLS_VOTE_IP_RATE_LIMITER = config('POLLS_VOTE_IP_RATE_LIMITER', default='polls.ratelimit.NoRateLimit')
+POLLS_VOTE_BURST = config('POLLS_VOTE_BURST', default=10, cast=int)
+POLLS_VOTE_RATE = config('POLLS_VOTE_RATE', default=0.5, cast=float)
+POLLS_VOTE_IP_BURST = config('POLLS_VOTE_IP_BURST', default=100, cast=int)
+POLLS_VOTE_IP_RATE = config('POLLS_VOTE_IP_RATE', default=5.0, cast=float)
+POLLS_REPEAT_VOTE_TIMEOUT = config('POLLS_REPEAT_VOTE_TIMEOUT', default=10, cast=int)
+
+# Vote event consumers only read events at least this many seconds old. Set
+# it to a few seconds on databases where concurrent transactions can commit
+# out of id order (PostgreSQL); SQLite serializes writes.
+POLLS_EVENT_SETTLE = config('POLLS_EVENT_SETTLE', default=0.0, cast=float)
+
+# Most points a vote timeline returns, longer ranges are downsampled.
+POLLS_TIMELINE_POINTS = config('POLLS_TIMELINE_POINTS', default=240, cast=int)
+
+# Serve the polls pages from polls.async_views, on by default under ASGI
+# (mysite/asgi.py).
+POLLS_ASYNC_VIEWS = config('POLLS_ASYNC_VIEWS', default=False, cast=bool)
+
+# Admin changelists of tables estimated above this many rows are paginated
+# from the estimate instead of counting every row.
+POLLS_ADMIN_ESTIMATED_COUNT = config('POLLS_ADMIN_ESTIMATED_COUNT', default=10000, cast=int)
+
+# Milliseconds from importing mysite/wsgi.py to the first response of an
+# API-only node (mysite.settings_api), checked by benchmark_coldstart.
+POLLS_COLDSTART_BUDGET_MS = config('POLLS_COLDSTART_BUDGET_MS', default=1500, cast=int)
+
+# Number of counter rows the votes of a choice are spread over, 1 writes
+# straight to the choice. Fold them back with compact_vote_counters.
+POLLS_COUNTER_SHARDS = config('POLLS_COUNTER_SHARDS', default=1, cast=int)
+
+# CachedModelBackend is a ModelBackend, so it is the only backend: listing
+# both would hash the password twice on every failed login. Sessions logged
+# in through ModelBackend before it log in again once.
 AUTHENTICATION_BACKENDS = [
-    # username/password authentication
-   'django.contrib.auth.backends.ModelBackend',
+    # username/password authentication, with logged in users cached
+    'polls.auth.CachedModelBackend',
 ]
 
 LOGIN_REDIRECT_URL = '/polls/'    # ToDo app: use '/todo/'
@@ -129,6 +304,26 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# Static bundles, see polls/staticfiles.py. Outside DEBUG collectstatic
+# writes each bundle minified, every file gets a content-hashed name and
+# the {% bundle %} tag links the bundle instead of its sources.
+POLLS_STATIC_BUNDLES = {
+    'polls/index.css': ['polls/style.css'],
+    'polls/detail.css': ['polls/style2.css'],
+    'polls/results.css': ['polls/style3.css'],
+    'polls/login.css': ['polls/login_style.css'],
+    'polls/results.js': ['polls/vendor/jquery.min.js', 'polls/js/results.js'],
+}
+
+if not DEBUG:
+    STATICFILES_STORAGE = 'polls.staticfiles.BundledManifestStorage'
+
+# Serve STATIC_ROOT from Django where no web server does. Files with a
+# hashed name are cached by browsers for POLLS_STATIC_MAX_AGE seconds.
+POLLS_SERVE_STATIC = config('POLLS_SERVE_STATIC', default=False, cast=bool)
+POLLS_STATIC_MAX_AGE = config('POLLS_STATIC_MAX_AGE', default=365 * 24 * 60 * 60, cast=int)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -0,0 +1,24 @@
+"""
+Settings of an API-only node of mysite.
+
+Everything of mysite.settings minus what only the HTML site needs: no
+admin, static files, signup or login pages. The node serves the polls
+urls, so resultData, the vote and the results endpoints, and loads the rest
+lazily. Run it with DJANGO_SETTINGS_MODULE=mysite.settings_api.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in ('django.contrib.admin', 'django.contrib.staticfiles')
+]
+
+# no page of this node is meant to be framed or not
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware != 'django.middleware.clickjacking.XFrameOptionsMiddleware'
+]
+
+ROOT_URLCONF = 'mysite.urls_api'
@@ -0,0 +1,9 @@
+"""Mysite URL Configuration of API-only nodes (mysite.settings_api).
+
+Only the polls urls, without the admin and the account pages.
+"""
+from django.urls import include, path
+
+urlpatterns = [
+    path('polls/', include('polls.urls')),
+]
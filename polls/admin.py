@@ -1,8 +1,157 @@
-"""Handle admin process."""
+"""Handle admin process.
 
+The changelists load what they show in their own query: vote totals are
+annotated from the counters, related objects are joined with
+list_select_related, and large tables are paginated from an estimated row
+count instead of a COUNT(*) over every row.
+"""
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
-# Register your models here.
-from .models import Question, Choice
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from . import backends, cache, counters, services, snapshots
+from .models import Question, Choice, Vote
+
+
+def estimated_count(queryset):
+    """Return a cheap estimate of the rows of an unfiltered queryset, or None if there is none."""
+    if queryset.query.where:
+        return None
+    model = queryset.model
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            # the largest rowid is found from the index, deleted rows are counted too
+            cursor.execute(f"SELECT MAX(_rowid_) FROM {connection.ops.quote_name(model._meta.db_table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using the estimated row count of large unfiltered tables."""
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= settings.POLLS_ADMIN_ESTIMATED_COUNT:
+            return estimate
+        return super().count
+
+
+class ChoiceInline(admin.TabularInline):
+    """Choices of a question with their vote totals."""
+
+    model = Choice
+    extra = 1
+    fields = ('choice_text', 'total_votes')
+    readonly_fields = ('total_votes',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total=F('vote_count') + counters.shard_total())
+
+    @admin.display(description="votes")
+    def total_votes(self, choice):
+        return getattr(choice, 'total', 0)
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    """Questions with their vote totals."""
+
+    list_display = ('question_text', 'pub_date', 'end_date', 'total_votes')
+    list_filter = ('pub_date',)
+    search_fields = ('question_text',)
+    readonly_fields = ('total_votes',)
+    inlines = [ChoiceInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total=counters.question_total())
+
+    @admin.display(description="votes", ordering='total')
+    def total_votes(self, question):
+        return getattr(question, 'total', 0)
+
+
+@admin.register(Choice)
+class ChoiceAdmin(admin.ModelAdmin):
+    """Choices with their question and vote totals."""
+
+    list_display = ('choice_text', 'question', 'total_votes')
+    list_select_related = ('question',)
+    search_fields = ('choice_text',)
+    autocomplete_fields = ('question',)
+    readonly_fields = ('vote_count',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total=F('vote_count') + counters.shard_total())
+
+    @admin.display(description="votes", ordering='total')
+    def total_votes(self, choice):
+        return choice.total
+
+
+class VoteAdminForm(forms.ModelForm):
+    """Vote form refusing a choice of another question."""
+
+    class Meta:
+        model = Vote
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # the question is read only once the vote exists
+        question = cleaned_data.get('question') or (self.instance.question if self.instance.pk else None)
+        choice = cleaned_data.get('choice')
+        if question is not None and choice is not None and choice.question_id != question.pk:
+            self.add_error('choice', f"This choice is not one of the choices of \"{question}\".")
+        return cleaned_data
+
+
+@admin.register(Vote)
+class VoteAdmin(admin.ModelAdmin):
+    """Votes with their user, question and choice joined in."""
+
+    form = VoteAdminForm
+
+    list_display = ('user', 'question', 'choice', 'voted_at')
+    list_select_related = ('user', 'question', 'choice')
+    list_filter = ('voted_at',)
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user', 'question', 'choice')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        # a vote moves to another choice, never to another user or question
+        return ('user', 'question', 'voted_at') if obj else ('voted_at',)
+
+    def save_model(self, request, obj, form, change):
+        """Save through cast_vote so the vote counters and the results follow."""
+        vote, old_choice_id = services.cast_vote(obj.user, obj.question, obj.choice)
+        obj.pk = vote.pk
+        snapshots.discard(obj.question_id)
+        cache.refresh(obj.question_id)
+        backends.publish_vote(obj.question_id, counters.vote_deltas(obj.choice_id, old_choice_id))
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Vote.objects.filter(pk=obj.pk))
 
-admin.site.register(Question)
-admin.site.register(Choice)
+    def delete_queryset(self, request, queryset):
+        """Delete votes in bulk and refresh the results they counted in."""
+        for question_id, deltas in services.delete_votes(queryset).items():
+            cache.refresh(question_id)
+            backends.publish_vote(question_id, deltas)
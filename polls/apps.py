@@ -8,3 +8,13 @@ class PollsConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        """Connect the signal receivers of the app."""
+        from django.db.backends.signals import connection_created
+
+        from . import backends, signals  # noqa: F401
+        from .metrics import install_sql_timer
+        connection_created.connect(install_sql_timer)
+        # follow the votes of the other nodes from the start
+        backends.get_backend()
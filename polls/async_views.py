@@ -0,0 +1,144 @@
+"""Async versions of the polls pages, the default under ASGI.
+
+They read questions and choices through the async ORM interface and run
+the cache, template rendering and the vote transaction off the event loop
+with sync_to_async, so under an ASGI server a request waiting on the
+database does not hold a worker thread of its own.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Q
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import render
+from django.urls import reverse
+
+from . import backends, cache, counters, exports, ingest, ratelimit, services, snapshots
+from .decorators import async_condition, async_login_required, cache_for_anonymous, gzip_response, vary_on_cookie
+from .models import Choice, Question
+from .views import (decode_cursor, detail_etag, encode_cursor, index_stamp,
+                    live_stream, logger, result_data_etag, results_etag, results_stamp)
+
+arender = sync_to_async(render)
+
+
+@cache_for_anonymous(index_stamp)
+async def index(request):
+    """Contain list of polls, one page at a time from the oldest published."""
+    questions = Question.objects.published().with_is_open().order_by('pub_date', 'id')
+    open_only = request.GET.get('open') == '1'
+    if open_only:
+        questions = questions.open_for_voting()
+    after = decode_cursor(request.GET.get('after', ''))
+    if after:
+        pub_date, pk = after
+        questions = questions.filter(Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk))
+    # fetch one extra row to know whether there is a next page
+    page_size = settings.POLLS_INDEX_PAGE_SIZE
+    latest_question_list = [question async for question in questions[:page_size + 1]]
+    next_cursor = None
+    if len(latest_question_list) > page_size:
+        latest_question_list = latest_question_list[:page_size]
+        next_cursor = encode_cursor(latest_question_list[-1])
+    context = {
+        'latest_question_list': latest_question_list,
+        'next_cursor': next_cursor,
+        'is_first_page': not after,
+        'open_only': open_only,
+    }
+    return await arender(request, 'polls/index.html', context)
+
+
+@vary_on_cookie
+@async_condition(etag_func=detail_etag)
+async def detail(request, question_id):
+    """Show detail of polls, handle when polls not able to vote."""
+    question = await get_open_question(question_id)
+    if question is None:
+        await sync_to_async(messages.error)(request, "You try to access poll that does not allow")
+        return HttpResponseRedirect(reverse('polls:index'))
+    context = {'question': question, 'cache_timeout': settings.POLLS_PAGE_CACHE_TIMEOUT}
+    return await arender(request, 'polls/detail.html', context)
+
+
+async def get_open_question(question_id):
+    """Return the question if it is open for voting, or None if it is closed.
+
+    Raise Http404 if there is no such question.
+    """
+    question = await Question.objects.open_for_voting().filter(pk=question_id).afirst()
+    if question is None and not await Question.objects.filter(pk=question_id).aexists():
+        raise Http404("No Question matches the given query.")
+    return question
+
+
+@async_condition(etag_func=results_etag)
+@cache_for_anonymous(results_stamp)
+async def results(request, question_id):
+    """Show the results of polls, from their snapshot once closed."""
+    question = await Question.objects.select_related('snapshot').filter(pk=question_id).afirst()
+    if question is None:
+        raise Http404("No Question matches the given query.")
+    stamp = await sync_to_async(cache.get_version)(question.id)
+    snapshot = await sync_to_async(snapshots.for_question)(question)
+    if snapshot is not None:
+        choices = snapshot.choices()
+    else:
+        choices = await sync_to_async(cache.get_results)(question.id)
+        if settings.POLLS_VOTE_INGEST:
+            overlaid = await sync_to_async(ingest.overlay_pending)(choices, request.user, question.id)
+            if overlaid is not choices:
+                choices, stamp = overlaid, f'{stamp}-{request.user.id}'
+    context = {
+        'question': question,
+        'choices': choices,
+        'snapshot': snapshot,
+        'live_stream': live_stream(request, snapshot),
+        'results_stamp': stamp,
+        'cache_timeout': settings.POLLS_PAGE_CACHE_TIMEOUT,
+    }
+    return await arender(request, 'polls/results.html', context)
+
+
+@async_login_required(login_url='/accounts/login/')
+async def vote(request, question_id):
+    """Make choice be able to vote."""
+    user = request.user
+    screened = await sync_to_async(ratelimit.screen_vote)(request, question_id)
+    if screened is not None:
+        return screened
+    question = await get_open_question(question_id)
+    if question is None:
+        await sync_to_async(messages.error)(request, "You try to vote in poll that does not allow")
+        return HttpResponseRedirect(reverse('polls:index'))
+    try:
+        selected_choice = await question.choice_set.aget(pk=request.POST['choice'])
+    except (KeyError, Choice.DoesNotExist):
+        # Redisplay the question voting form.
+        return await arender(request, 'polls/detail.html', {
+            'question': question,
+            'error_message': "You didn't select a choice.",
+            'cache_timeout': settings.POLLS_PAGE_CACHE_TIMEOUT,
+        })
+    if settings.POLLS_VOTE_INGEST:
+        await sync_to_async(ingest.get_queue().submit)(user.id, question.id, selected_choice.id)
+    else:
+        _, old_choice_id = await sync_to_async(services.cast_vote)(user, question, selected_choice)
+        await sync_to_async(cache.refresh)(question.id)
+        deltas = counters.vote_deltas(selected_choice.id, old_choice_id)
+        await sync_to_async(backends.publish_vote)(question.id, deltas)
+    await sync_to_async(ratelimit.remember_vote)(user.id, question.id, selected_choice.id)
+    logger.info(f'{user} vote {selected_choice} in question {question}')
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+
+
+@gzip_response
+@async_condition(etag_func=result_data_etag)
+async def resultData(request, obj):
+    """To return the data of that polls question, in the format the client asks for."""
+    choices = await sync_to_async(cache.get_results)(obj, loader=snapshots.get_results)
+    if choices is None:
+        raise Http404("No Question matches the given query.")
+    if settings.POLLS_VOTE_INGEST:
+        choices = await sync_to_async(ingest.overlay_pending)(choices, request.user, obj)
+    return exports.results_response(choices, exports.negotiate(request))
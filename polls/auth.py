@@ -0,0 +1,41 @@
+"""Authentication backend serving logged in users from the cache.
+
+AuthenticationMiddleware loads request.user through the backend that
+logged the user in. CachedModelBackend keeps the User for
+POLLS_USER_CACHE_TIMEOUT seconds, so with a cache or signed cookie
+session engine an authenticated request reads neither the session nor the
+user from the database. Saving or deleting a user forgets its cache entry.
+
+The entry is the whole User row, password hash included, so the cache must
+be as private as the database. Forgetting only reaches the cache of the
+node that saved the user: a site of several nodes needs a shared cache, or
+POLLS_USER_CACHE_TIMEOUT set to 0, for a deactivation or password change
+to take effect everywhere at once.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def _user_key(user_id):
+    return f'polls:user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop the cached copy of a user."""
+    cache.delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user reads through the cache."""
+
+    def get_user(self, user_id):
+        if not settings.POLLS_USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.POLLS_USER_CACHE_TIMEOUT)
+        return user
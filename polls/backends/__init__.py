@@ -0,0 +1,58 @@
+"""Tell every node of the site about vote count changes.
+
+A vote publishes its {choice_id: change} mapping through the backend named
+by POLLS_PUBSUB_BACKEND. Every node subscribes to it: the change goes to
+the live results streams of the node, and a node that did not cast the
+vote expires its tallies if they live in a per-process cache.
+
+polls.backends.local.LocalBackend serves a single process,
+polls.backends.sqlite.SQLiteBackend nodes sharing a host (and the tests),
+and polls.backends.redis.RedisBackend nodes sharing a Redis server.
+"""
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .. import cache, streams
+
+_backend = None
+_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the vote changes backend of this process, subscribed to by its streams and cache."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            backend = import_string(settings.POLLS_PUBSUB_BACKEND)(**settings.POLLS_PUBSUB_OPTIONS)
+            backend.subscribe(on_vote)
+            _backend = backend
+        return _backend
+
+
+def publish_vote(question_id, deltas):
+    """Send the {choice_id: change} mapping of a vote to every node."""
+    deltas = {choice_id: change for choice_id, change in deltas.items() if change}
+    if deltas:
+        get_backend().publish(question_id, deltas)
+
+
+def on_vote(question_id, deltas, local):
+    """Relay a vote to the streams of this node, expiring tallies another node changed."""
+    if not local and cache.is_process_local():
+        cache.bump_version(question_id)
+    streams.broadcaster.publish(question_id, deltas)
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    """Build a new backend when its settings change (in tests)."""
+    global _backend
+    if setting in ('POLLS_PUBSUB_BACKEND', 'POLLS_PUBSUB_OPTIONS'):
+        with _lock:
+            if _backend is not None:
+                _backend.close()
+            _backend = None
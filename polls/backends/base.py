@@ -0,0 +1,43 @@
+"""Base class of the backends sending vote count changes between nodes."""
+import uuid
+
+
+class PubSubBackend:
+    """Publish {choice_id: change} mappings of questions to every node of the site.
+
+    publish() hands a change to the subscribers of this node at once and
+    sends it to the other nodes. Subclasses implement send() for their
+    transport and call receive() with every message that arrives from it.
+    """
+
+    def __init__(self):
+        self.node = uuid.uuid4().hex
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call callback(question_id, deltas, local) for every change published on any node."""
+        self._subscribers.append(callback)
+
+    def publish(self, question_id, deltas):
+        """Send the count changes of a question to every node."""
+        self.deliver(question_id, deltas, local=True)
+        self.send({'node': self.node, 'question_id': int(question_id),
+                   'deltas': {str(choice_id): change for choice_id, change in deltas.items()}})
+
+    def receive(self, message):
+        """Deliver a message of the transport, unless this node published it."""
+        if message['node'] == self.node:
+            return
+        deltas = {int(choice_id): change for choice_id, change in message['deltas'].items()}
+        self.deliver(message['question_id'], deltas, local=False)
+
+    def deliver(self, question_id, deltas, local):
+        for callback in list(self._subscribers):
+            callback(question_id, deltas, local)
+
+    def send(self, message):
+        """Send a JSON-serializable message to the other nodes."""
+        raise NotImplementedError
+
+    def close(self):
+        """Stop receiving messages from the other nodes."""
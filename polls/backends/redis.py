@@ -0,0 +1,39 @@
+"""Backend passing changes through a Redis pub/sub channel.
+
+Needs the redis package, which the site does not install by default.
+"""
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import PubSubBackend
+
+
+class RedisBackend(PubSubBackend):
+    """Publish changes on a Redis channel every node listens to."""
+
+    def __init__(self, url='redis://localhost:6379/0', channel='polls:votes', poll_interval=0.2):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("the redis vote changes backend needs the redis package")
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self, callback):
+        super().subscribe(callback)
+        if self._listener is None:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: lambda message: self.receive(json.loads(message['data']))})
+            self._listener = pubsub.run_in_thread(sleep_time=self.poll_interval, daemon=True)
+
+    def send(self, message):
+        self._client.publish(self.channel, json.dumps(message))
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+        self._client.close()
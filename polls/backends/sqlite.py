@@ -0,0 +1,76 @@
+"""Backend passing changes through a SQLite file shared by the nodes of one host.
+
+Meant for tests and for several processes on one machine: every message
+is a row of the file, and each node polls for rows added after the last
+one it has seen.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .base import PubSubBackend
+
+logger = logging.getLogger('polls')
+
+
+class SQLiteBackend(PubSubBackend):
+    """Publish changes as rows of a SQLite file that every node polls.
+
+    With poll_interval None no thread is started, and the caller runs
+    poll() itself. Messages older than retention seconds are deleted.
+    """
+
+    def __init__(self, path, poll_interval=0.2, retention=300):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._connection = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS polls_messages '
+                '(id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, body TEXT NOT NULL)')
+            self._last_id = self._connection.execute('SELECT COALESCE(MAX(id), 0) FROM polls_messages').fetchone()[0]
+
+    def subscribe(self, callback):
+        super().subscribe(callback)
+        if self.poll_interval is not None and self._thread is None:
+            self._thread = threading.Thread(target=self._follow, name='polls-sqlite-pubsub', daemon=True)
+            self._thread.start()
+
+    def send(self, message):
+        now = time.time()
+        with self._lock:
+            self._connection.execute('INSERT INTO polls_messages (created, body) VALUES (?, ?)',
+                                     (now, json.dumps(message)))
+            self._connection.execute('DELETE FROM polls_messages WHERE created < ?', (now - self.retention,))
+
+    def poll(self):
+        """Deliver the messages added since the last poll and return how many there were."""
+        with self._lock:
+            rows = self._connection.execute('SELECT id, body FROM polls_messages WHERE id > ? ORDER BY id',
+                                            (self._last_id,)).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+        for _, body in rows:
+            self.receive(json.loads(body))
+        return len(rows)
+
+    def _follow(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                # keep following, a broken message must not stop the updates
+                logger.exception("polling vote changes failed")
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._connection.close()
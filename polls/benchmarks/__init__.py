@@ -0,0 +1,4 @@
+"""Benchmarks of the hot paths of the polls app.
+
+Run them with ``python manage.py benchmark``.
+"""
@@ -0,0 +1,92 @@
+"""Time the cold start of the site, from a new interpreter to its first response.
+
+Every run starts a fresh `python -X importtime` process, which imports
+mysite/wsgi.py under a settings module and sends one GET through the WSGI
+application. The report holds, per settings module, the median time to
+import the application and to its first response, the wall time of the
+whole process and the slowest imports by package.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+PROFILES = {
+    'full': 'mysite.settings',
+    'api': 'mysite.settings_api',
+}
+
+# run in the child process, prints the timings of the first response
+CHILD = """
+import json, sys, time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+start = time.perf_counter()
+from mysite.wsgi import application
+imported = time.perf_counter()
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost', 'wsgi.input': BytesIO()}
+setup_testing_defaults(environ)
+status = []
+b''.join(application(environ, lambda code, headers, exc_info=None: status.append(code)))
+done = time.perf_counter()
+print(json.dumps({'status': status[0], 'import_ms': (imported - start) * 1000,
+                  'first_response_ms': (done - start) * 1000}))
+"""
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)')
+
+
+def parse_importtime(text, depth=2):
+    """Return {package: milliseconds} of the self import time in -X importtime output.
+
+    Modules are grouped by their first `depth` dotted names.
+    """
+    packages = {}
+    for line in text.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            package = '.'.join(match.group(3).split('.')[:depth])
+            packages[package] = packages.get(package, 0) + int(match.group(1)) / 1000
+    return packages
+
+
+def cold_start(settings_module, path, env=None):
+    """Start one fresh process serving path and return its timings.
+
+    Raise RuntimeError if the process fails or its response is not a 200.
+    """
+    env = dict(os.environ, **(env or {}), DJANGO_SETTINGS_MODULE=settings_module, ALLOWED_HOSTS='localhost')
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, path],
+                             cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(f"cold start under {settings_module} failed:\n{process.stderr[-2000:]}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if not result['status'].startswith('200'):
+        raise RuntimeError(f"cold start under {settings_module} answered {path} with {result['status']}")
+    result['process_ms'] = wall * 1000
+    result['imports'] = parse_importtime(process.stderr)
+    return result
+
+
+def run(path, runs=5, env=None, top=10):
+    """Return the median cold start of every settings profile."""
+    report = {'params': {'path': path, 'runs': runs}}
+    for profile, settings_module in PROFILES.items():
+        results = [cold_start(settings_module, path, env) for _ in range(runs)]
+        imports = results[len(results) // 2]['imports']
+        report[profile] = {
+            'status': results[-1]['status'],
+            'import_ms': round(statistics.median(r['import_ms'] for r in results), 1),
+            'first_response_ms': round(statistics.median(r['first_response_ms'] for r in results), 1),
+            'process_ms': round(statistics.median(r['process_ms'] for r in results), 1),
+            'slowest_imports_ms': {package: round(ms, 1) for package, ms in
+                                   sorted(imports.items(), key=lambda item: -item[1])[:top]},
+        }
+    return report
@@ -0,0 +1,314 @@
+"""Seed a poll database and time the polls views against it.
+
+Each endpoint is driven through the Django test client and the sync views
+(WSGI path) and the async test client and the async views (ASGI path). For every endpoint the report holds the
+p50 and p99 latency in milliseconds, the requests per second and the mean
+and max number of SQL queries per request.
+
+A session run times the logged in results page and vote with each session
+store: database sessions with users read from the database, against cache
+and signed cookie sessions with users served by polls.auth.CachedModelBackend.
+
+A concurrency run then sends the same mix of page reads from many clients
+at once: threads of test clients on the sync views (the WSGI path of
+mysite/wsgi.py) against gathered async clients on the async views (the
+ASGI path mysite/asgi.py serves under uvicorn).
+"""
+import asyncio
+import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import counters
+from polls.models import Choice, Question, Vote
+
+ENDPOINTS = ('index', 'detail', 'results', 'resultData', 'vote')
+CONCURRENT_ENDPOINTS = ('detail', 'results', 'resultData')
+SESSION_ENDPOINTS = ('results', 'vote')
+# session store -> (session engine, authentication backend)
+SESSION_PROFILES = {
+    'db': ('django.contrib.sessions.backends.db', 'django.contrib.auth.backends.ModelBackend'),
+    'cache': ('django.contrib.sessions.backends.cache', 'polls.auth.CachedModelBackend'),
+    'signed_cookies': ('django.contrib.sessions.backends.signed_cookies', 'polls.auth.CachedModelBackend'),
+}
+
+
+def seed(questions=20, choices=5, votes=200):
+    """Create open questions with choices and `votes` voters voting in each.
+
+    Return the seeded questions, each with a `choice_ids` list.
+    """
+    now = timezone.now()
+    question_list = Question.objects.bulk_create([
+        Question(question_text=f"Benchmark question {n}",
+                 pub_date=now - datetime.timedelta(days=1),
+                 end_date=now + datetime.timedelta(days=30))
+        for n in range(questions)
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=question, choice_text=f"Choice {n}")
+        for question in question_list for n in range(choices)
+    ])
+    for question in question_list:
+        question.choice_ids = list(question.choice_set.order_by('id').values_list('id', flat=True))
+    users = User.objects.bulk_create([User(username=f"bench-voter-{n}") for n in range(votes)])
+    Vote.objects.bulk_create([
+        Vote(user=user, question=question, choice_id=question.choice_ids[n % choices])
+        for question in question_list for n, user in enumerate(users)
+    ], batch_size=500)
+    counters.rebuild()
+    return question_list
+
+
+def percentile(values, fraction):
+    """Return the value below which `fraction` of the sorted values fall."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies, queries):
+    """Return the statistics of one endpoint."""
+    total = sum(latencies)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rps': round(len(latencies) / total, 1) if total else None,
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def endpoint_request(endpoint, question, n):
+    """Return (method, url, data) of the n-th request to an endpoint."""
+    if endpoint == 'index':
+        return 'get', reverse('polls:index'), None
+    if endpoint == 'resultData':
+        return 'get', reverse('polls:resultData', args=(question.id,)), None
+    if endpoint == 'vote':
+        choice_id = question.choice_ids[n % len(question.choice_ids)]
+        return 'post', reverse('polls:vote', args=(question.id,)), {'choice': choice_id}
+    return 'get', reverse(f'polls:{endpoint}', args=(question.id,)), None
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_wsgi(questions, requests, voter):
+    """Drive every endpoint through the test client and return its statistics."""
+    client = Client()
+    client.force_login(voter)
+    counter = QueryCounter()
+    report = {}
+    with connection.execute_wrapper(counter):
+        for endpoint in ENDPOINTS:
+            cache.clear()
+            latencies, queries = [], []
+            for n in range(requests):
+                method, url, data = endpoint_request(endpoint, questions[n % len(questions)], n)
+                before = counter.count
+                start = time.perf_counter()
+                getattr(client, method)(url, data)
+                latencies.append(time.perf_counter() - start)
+                queries.append(counter.count - before)
+            report[endpoint] = summarize(latencies, queries)
+    return report
+
+
+def run_asgi(questions, requests, voter):
+    """Drive every endpoint through the async test client and the async views, as served under ASGI."""
+    client = AsyncClient()
+    client.force_login(voter)
+    counter = QueryCounter()
+    # async ORM calls and sync_to_async code run on this thread's connection
+    with override_settings(POLLS_ASYNC_VIEWS=True), connection.execute_wrapper(counter):
+        return async_to_sync(drive_async)(client, questions, requests, counter)
+
+
+async def drive_async(client, questions, requests, counter):
+    """Send the requests of every endpoint with an async client."""
+    report = {}
+    for endpoint in ENDPOINTS:
+        cache.clear()
+        latencies, queries = [], []
+        for n in range(requests):
+            method, url, data = endpoint_request(endpoint, questions[n % len(questions)], n)
+            before = counter.count
+            start = time.perf_counter()
+            await getattr(client, method)(url, data)
+            latencies.append(time.perf_counter() - start)
+            queries.append(counter.count - before)
+        report[endpoint] = summarize(latencies, queries)
+    return report
+
+
+def run_sessions(questions, requests):
+    """Drive the logged in results page and vote with every session store and return their statistics."""
+    counter = QueryCounter()
+    report = {}
+    for store, (engine, backend) in SESSION_PROFILES.items():
+        voter = User.objects.create_user(username=f"bench-session-{store}")
+        with override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]), \
+                connection.execute_wrapper(counter):
+            cache.clear()
+            client = Client()
+            client.force_login(voter, backend=backend)
+            report[store] = {}
+            for endpoint in SESSION_ENDPOINTS:
+                latencies, queries = [], []
+                for n in range(requests):
+                    method, url, data = endpoint_request(endpoint, questions[n % len(questions)], n)
+                    before = counter.count
+                    start = time.perf_counter()
+                    getattr(client, method)(url, data)
+                    latencies.append(time.perf_counter() - start)
+                    queries.append(counter.count - before)
+                report[store][endpoint] = summarize(latencies, queries)
+    return report
+
+
+def summarize_concurrent(latencies, seconds):
+    """Return the statistics of a concurrency run lasting `seconds`."""
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rps': round(len(latencies) / seconds, 1),
+    }
+
+
+def concurrent_urls(questions, requests):
+    """Return the urls of a concurrency run, cycling through endpoints and questions."""
+    return [endpoint_request(CONCURRENT_ENDPOINTS[n % len(CONCURRENT_ENDPOINTS)],
+                             questions[n % len(questions)], n)[1]
+            for n in range(requests)]
+
+
+def run_threaded(urls, voters):
+    """Send urls from one thread per voter through the sync views."""
+    clients = []
+    for voter in voters:
+        client = Client()
+        client.force_login(voter)
+        clients.append(client)
+    latencies = []
+
+    def worker(n):
+        try:
+            for url in urls[n::len(clients)]:
+                start = time.perf_counter()
+                clients[n].get(url)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    cache.clear()
+    start = time.perf_counter()
+    with override_settings(POLLS_ASYNC_VIEWS=False), ThreadPoolExecutor(len(clients)) as pool:
+        list(pool.map(worker, range(len(clients))))
+    return summarize_concurrent(latencies, time.perf_counter() - start)
+
+
+def run_gathered(urls, voters):
+    """Send urls from one async client per voter, all on one event loop, through the async views."""
+    clients = []
+    for voter in voters:
+        client = AsyncClient()
+        client.force_login(voter)
+        clients.append(client)
+    cache.clear()
+    with override_settings(POLLS_ASYNC_VIEWS=True):
+        return async_to_sync(drive_gathered)(clients, urls)
+
+
+async def drive_gathered(clients, urls):
+    """Send urls concurrently from the async clients."""
+    latencies = []
+
+    async def worker(n):
+        for url in urls[n::len(clients)]:
+            start = time.perf_counter()
+            await clients[n].get(url)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(len(clients))))
+    return summarize_concurrent(latencies, time.perf_counter() - start)
+
+
+def run_concurrency(questions, requests, concurrency):
+    """Return the statistics of concurrent page reads on the WSGI and ASGI paths."""
+    voters = [User.objects.create_user(username=f"bench-reader-{n}") for n in range(concurrency)]
+    urls = concurrent_urls(questions, requests)
+    return {
+        'wsgi_threads': run_threaded(urls, voters),
+        'asgi_async_views': run_gathered(urls, voters),
+    }
+
+
+# one voter sends every benchmarked vote, which must all reach the database
+@override_settings(POLLS_VOTE_RATE_LIMITER='polls.ratelimit.NoRateLimit', POLLS_REPEAT_VOTE_TIMEOUT=0)
+def run(questions=20, choices=5, votes=200, requests=200, concurrency=8):
+    """Seed the database and return the report of both client paths."""
+    question_list = seed(questions, choices, votes)
+    # a voter per path, so both see the same mix of new and changed votes
+    return {
+        'params': {'questions': questions, 'choices': choices, 'votes': votes, 'requests': requests,
+                   'concurrency': concurrency},
+        'wsgi': run_wsgi(question_list, requests, User.objects.create_user(username="bench-wsgi")),
+        'asgi': run_asgi(question_list, requests, User.objects.create_user(username="bench-asgi")),
+        'sessions': run_sessions(question_list, requests),
+        'concurrency': run_concurrency(question_list, requests, concurrency),
+    }
+
+
+def compare(report, baseline, latency_tolerance=1.0):
+    """Return the regressions of report against baseline.
+
+    Queries per request may never exceed the baseline; p50 and p99
+    latencies may exceed it by latency_tolerance (1.0 is twice as slow).
+    The concurrency run is reported only.
+    """
+    regressions = []
+    for path in ('wsgi', 'asgi'):
+        for endpoint, stats in report.get(path, {}).items():
+            base = baseline.get(path, {}).get(endpoint)
+            if base is None:
+                continue
+            if stats['queries_max'] > base['queries_max']:
+                regressions.append(f"{path} {endpoint}: {stats['queries_max']} queries per request, "
+                                   f"baseline {base['queries_max']}")
+            for key in ('p50_ms', 'p99_ms'):
+                if stats[key] > base[key] * (1 + latency_tolerance):
+                    regressions.append(f"{path} {endpoint}: {key} {stats[key]}, baseline {base[key]}")
+    return regressions
+
+
+def load_baseline(path):
+    """Return the stored baseline report."""
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_baseline(report, path):
+    """Store report as the new baseline."""
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,92 @@
+"""Write-through cache of the vote tallies of questions.
+
+Tallies are stored under a key carrying a per-question version stamp.
+A vote bumps the stamp and writes the fresh tallies under the new key, so
+readers never see a stale tally and only go to the database after an
+eviction or a cold start.
+
+The same stamps tell cached pages and ETags when the tallies changed, and
+an index stamp does the same for the list of questions.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import services
+
+
+INDEX_VERSION_KEY = 'polls:index-version'
+
+
+def _version_key(question_id):
+    return f'polls:results-version:{question_id}'
+
+
+def _results_key(question_id, version):
+    return f'polls:results:{question_id}:{version}'
+
+
+def _get_stamp(key):
+    stamp = cache.get(key)
+    if stamp is None:
+        # start from the clock so a stamp evicted from the cache can never
+        # come back with a value that still has data stored under it
+        cache.add(key, time.time_ns(), timeout=None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def _bump_stamp(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _get_stamp(key)
+
+
+def is_process_local():
+    """Return whether the cache lives in this process, unseen by other nodes."""
+    return isinstance(caches['default'], LocMemCache)
+
+
+def get_version(question_id):
+    """Return the current version stamp of a question's tallies."""
+    return _get_stamp(_version_key(question_id))
+
+
+def bump_version(question_id):
+    """Move a question to a new version stamp and return it."""
+    return _bump_stamp(_version_key(question_id))
+
+
+def get_index_version():
+    """Return the version stamp of the list of questions."""
+    return _get_stamp(INDEX_VERSION_KEY)
+
+
+def bump_index_version():
+    """Move the list of questions to a new version stamp."""
+    return _bump_stamp(INDEX_VERSION_KEY)
+
+
+def get_results(question_id, loader=services.get_results):
+    """Return the cached tallies of a question, loading them with loader on a miss.
+
+    A loader returning None (no such question) is not cached.
+    """
+    key = _results_key(question_id, get_version(question_id))
+    results = cache.get(key)
+    if results is None:
+        results = loader(question_id)
+        if results is not None:
+            cache.set(key, results, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return results
+
+
+def refresh(question_id):
+    """Store fresh tallies of a question after its votes changed."""
+    version = bump_version(question_id)
+    results = services.get_results(question_id)
+    cache.set(_results_key(question_id, version), results, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return results
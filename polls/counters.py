@@ -0,0 +1,147 @@
+"""Maintain the denormalized vote counters of choices.
+
+The votes of a choice are Choice.vote_count plus the count of its
+ChoiceCounterShard rows. With POLLS_COUNTER_SHARDS above 1, writes go to
+a shard picked by the voter (or at random) instead of the choice row, and
+compact() later folds the shards back into vote_count.
+"""
+import random
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import cache
+from .models import Choice, ChoiceCounterShard, ResultSnapshot
+
+
+def pick_shard(shard_key=None):
+    """Return the shard a write goes to, stable for the same shard_key."""
+    shards = settings.POLLS_COUNTER_SHARDS
+    if shard_key is None:
+        return random.randrange(shards)
+    return zlib.crc32(str(shard_key).encode()) % shards
+
+
+def increment(choice_id, amount=1, shard_key=None):
+    """Add amount to the vote counter of a choice in one UPDATE."""
+    if settings.POLLS_COUNTER_SHARDS <= 1:
+        Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + amount)
+        return
+    shard = pick_shard(shard_key)
+    shard_row = ChoiceCounterShard.objects.filter(choice_id=choice_id, shard=shard)
+    if shard_row.update(count=F('count') + amount):
+        return
+    try:
+        with transaction.atomic():
+            ChoiceCounterShard.objects.create(choice_id=choice_id, shard=shard, count=amount)
+    except IntegrityError:
+        # another vote created the shard first
+        shard_row.update(count=F('count') + amount)
+
+
+def vote_deltas(new_choice_id, old_choice_id=None):
+    """Return the {choice_id: change} of moving one vote from old_choice_id to new_choice_id."""
+    if old_choice_id == new_choice_id:
+        return {}
+    deltas = {new_choice_id: 1}
+    if old_choice_id is not None:
+        deltas[old_choice_id] = -1
+    return deltas
+
+
+def record_vote(new_choice_id, old_choice_id=None, shard_key=None):
+    """Move one vote to new_choice_id, taking it from old_choice_id if given.
+
+    Must be called inside the transaction that saves the vote, so the
+    counters never drift from the vote rows.
+    """
+    apply(vote_deltas(new_choice_id, old_choice_id), shard_key)
+
+
+def apply(deltas, shard_key=None):
+    """Apply a {choice_id: change} mapping of counter changes, one UPDATE per choice."""
+    for choice_id, amount in deltas.items():
+        if amount:
+            increment(choice_id, amount, shard_key)
+
+
+def retract(counts):
+    """Take deleted votes, a {choice_id: number of votes}, off their choices' counters.
+
+    Writes the choice rows, never a shard: votes deleted along with their
+    choice find its shards already gone, and a new shard would point at a
+    deleted choice.
+    """
+    for choice_id, count in counts.items():
+        if count:
+            Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') - count)
+
+
+def shard_total():
+    """Return the expression summing the shards of the choice in the outer query."""
+    shards = (ChoiceCounterShard.objects.filter(choice=OuterRef('pk'))
+              .values('choice').annotate(total=Sum('count')).values('total'))
+    return Coalesce(Subquery(shards), 0)
+
+
+def question_total():
+    """Return the expression summing every vote of the question in the outer query."""
+    counts = (Choice.objects.filter(question=OuterRef('pk'))
+              .values('question').annotate(total=Sum('vote_count')).values('total'))
+    shards = (ChoiceCounterShard.objects.filter(choice__question=OuterRef('pk'))
+              .values('choice__question').annotate(total=Sum('count')).values('total'))
+    return Coalesce(Subquery(counts), 0) + Coalesce(Subquery(shards), 0)
+
+
+def rebuild(question_ids=None, dry_run=False):
+    """Recount votes from the Vote table and fix the counters that drifted.
+
+    The choices and their shards are locked before the recount, so a vote
+    committing meanwhile waits for the fix instead of being overwritten.
+    Return a list of (choice, stored count, actual count) for every choice
+    whose counter was wrong.
+    """
+    choices = Choice.objects.all()
+    if question_ids:
+        choices = choices.filter(question_id__in=question_ids)
+    with transaction.atomic():
+        if not dry_run:
+            list(choices.select_for_update().values_list('id'))
+            list(ChoiceCounterShard.objects.select_for_update().filter(choice__in=choices).values_list('id'))
+        counted = (choices.annotate(actual=Count('vote'), stored=F('vote_count') + shard_total())
+                   .order_by('id'))
+        mismatched = [(c, c.stored, c.actual) for c in counted if c.stored != c.actual]
+        if dry_run:
+            return mismatched
+        for choice, _, actual in mismatched:
+            ChoiceCounterShard.objects.filter(choice=choice).delete()
+            Choice.objects.filter(pk=choice.pk).update(vote_count=actual)
+        question_ids = {choice.question_id for choice, _, _ in mismatched}
+        ResultSnapshot.objects.filter(pk__in=question_ids).delete()
+    for question_id in question_ids:
+        cache.bump_version(question_id)
+    return mismatched
+
+
+def compact(question_ids=None):
+    """Fold the counter shards into Choice.vote_count and delete them.
+
+    Return the number of shards folded.
+    """
+    with transaction.atomic():
+        shards = ChoiceCounterShard.objects.select_for_update()
+        if question_ids is not None:
+            shards = shards.filter(choice__question_id__in=question_ids)
+        shards = list(shards)
+        totals = Counter()
+        for shard in shards:
+            totals[shard.choice_id] += shard.count
+        ChoiceCounterShard.objects.filter(pk__in=[shard.pk for shard in shards]).delete()
+        for choice_id, total in totals.items():
+            if total:
+                Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + total)
+    return len(shards)
@@ -0,0 +1,168 @@
+"""View decorators of the polls app.
+
+Each decorator also wraps async views, running the parts that may touch
+the database or the session off the event loop.
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.middleware.gzip import GZipMiddleware
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+
+def page_cache_key(request, stamp_func, *args, **kwargs):
+    """Return the page cache key of a request, or None if it must not be cached."""
+    if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+            or len(messages.get_messages(request))):
+        return None
+    stamp = stamp_func(request, *args, **kwargs)
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'polls:page:{path}:{stamp}'
+
+
+def cache_for_anonymous(stamp_func):
+    """Cache the whole response of a view for anonymous users.
+
+    The cache key is the request path plus the value of
+    stamp_func(request, *args, **kwargs), so bumping the stamp of what the
+    page shows expires it. Logged in users, requests with messages to show
+    and non-200 responses always go through the view.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                key = await sync_to_async(page_cache_key)(request, stamp_func, *args, **kwargs)
+                if key is None:
+                    return await view_func(request, *args, **kwargs)
+                response = await cache.aget(key)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if response.status_code == 200:
+                        await cache.aset(key, response, settings.POLLS_PAGE_CACHE_TIMEOUT)
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = page_cache_key(request, stamp_func, *args, **kwargs)
+            if key is None:
+                return view_func(request, *args, **kwargs)
+            response = cache.get(key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response, settings.POLLS_PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """Async form of django.views.decorators.http.condition.
+
+    etag_func and last_modified_func stay sync functions and are run off
+    the event loop.
+    """
+    def validators(request, *args, **kwargs):
+        etag = etag_func(request, *args, **kwargs) if etag_func else None
+        last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+        if last_modified:
+            if not timezone.is_aware(last_modified):
+                last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+            last_modified = int(last_modified.timestamp())
+        return (quote_etag(etag) if etag is not None else None), last_modified
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return wrapper
+    return decorator
+
+
+_gzip = GZipMiddleware(lambda request: None)
+
+
+def gzip_response(view_func):
+    """Compress the response of a sync or async view for clients accepting gzip."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            return _gzip.process_response(request, await view_func(request, *args, **kwargs))
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        return _gzip.process_response(request, view_func(request, *args, **kwargs))
+    return wrapper
+
+
+def vary_on_cookie(view_func):
+    """Add Vary: Cookie to the responses of a sync or async view."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return wrapper
+
+
+def async_login_required(login_url=None):
+    """Async form of django.contrib.auth.decorators.login_required."""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if await sync_to_async(lambda: request.user.is_authenticated)():
+                return await view_func(request, *args, **kwargs)
+            # the auth views pull in the forms, import them once needed
+            from django.contrib.auth.views import redirect_to_login
+            return redirect_to_login(request.get_full_path(), login_url or settings.LOGIN_URL,
+                                     REDIRECT_FIELD_NAME)
+        return wrapper
+    return decorator
+
+
+def staff_member_required(view_func):
+    """Let only active staff through, like the admin's staff_member_required.
+
+    Others are sent to the admin login, without importing the admin, or
+    get a 403 where the admin is not installed (mysite.settings_api).
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_active and request.user.is_staff:
+            return view_func(request, *args, **kwargs)
+        if not apps.is_installed('django.contrib.admin'):
+            raise PermissionDenied
+        from django.contrib.auth.views import redirect_to_login
+        return redirect_to_login(request.get_full_path(), reverse('admin:login'), REDIRECT_FIELD_NAME)
+    return wrapper
@@ -0,0 +1,169 @@
+"""Append-only vote events and the vote timeline folded from them.
+
+Every change to a Vote row is also written as a VoteEvent: cast for a new
+vote, changed when it moves to another choice, retracted when it is
+deleted. Consumers read the events in id order from a stored high-water
+mark (an EventCursor) and fold them into materialized state, so time
+series are computed incrementally and can be rebuilt from the log without
+scanning Vote.
+
+The timeline consumer keeps per-minute and per-hour VoteBuckets per
+choice, off the vote path. Run it with the consume_vote_events command
+(--follow keeps a worker polling); the ingest flusher also runs it after
+each batch, and a timeline read first catches it up. Rebuild it with
+rebuild_timeline.
+
+Events are read once their transaction has committed. On databases where
+concurrent transactions may commit out of id order (PostgreSQL), set
+POLLS_EVENT_SETTLE to a few seconds so a consumer only reads events old
+enough that no lower id can still appear.
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EventCursor, VoteBucket, VoteEvent
+
+TIMELINE = 'timeline'
+
+
+def vote_event(user_id, question_id, choice_id, old_choice_id=None):
+    """Return the unsaved event of a vote for choice_id replacing old_choice_id, or None if nothing changed."""
+    if old_choice_id == choice_id:
+        return None
+    if old_choice_id is None:
+        return VoteEvent(kind=VoteEvent.CAST, user_id=user_id, question_id=question_id, choice_id=choice_id)
+    return VoteEvent(kind=VoteEvent.CHANGED, user_id=user_id, question_id=question_id,
+                     choice_id=choice_id, previous_choice_id=old_choice_id)
+
+
+def record_vote(user_id, question_id, choice_id, old_choice_id=None):
+    """Append the event of a vote, in the transaction that saves it."""
+    event = vote_event(user_id, question_id, choice_id, old_choice_id)
+    if event is not None:
+        event.save()
+    return event
+
+
+def record_retraction(user_id, question_id, choice_id):
+    """Append the event of a deleted vote."""
+    return VoteEvent.objects.create(kind=VoteEvent.RETRACTED, user_id=user_id,
+                                    question_id=question_id, choice_id=choice_id)
+
+
+def event_deltas(event):
+    """Return the {choice_id: change} of an event."""
+    if event.kind == VoteEvent.RETRACTED:
+        return {event.choice_id: -1}
+    deltas = {event.choice_id: 1}
+    if event.previous_choice_id is not None:
+        deltas[event.previous_choice_id] = -1
+    return deltas
+
+
+def pending_events(name, batch_size):
+    """Lock the cursor of consumer name and return it with its next batch of events."""
+    cursor, _ = EventCursor.objects.select_for_update().get_or_create(name=name)
+    events = VoteEvent.objects.filter(id__gt=cursor.position).order_by('id')
+    if settings.POLLS_EVENT_SETTLE:
+        events = events.filter(created__lte=timezone.now() - datetime.timedelta(seconds=settings.POLLS_EVENT_SETTLE))
+    return cursor, list(events[:batch_size])
+
+
+def bucket_start(moment, resolution):
+    """Return the UTC start of the bucket of `resolution` seconds holding moment."""
+    moment = moment.astimezone(datetime.timezone.utc).replace(second=0, microsecond=0)
+    if resolution == VoteBucket.HOUR:
+        moment = moment.replace(minute=0)
+    return moment
+
+
+def timeline_changes(events):
+    """Return the {(resolution, question_id, choice_id, start): change} the events make to the vote buckets."""
+    changes = Counter()
+    for event in events:
+        for resolution, _ in VoteBucket.RESOLUTIONS:
+            start = bucket_start(event.created, resolution)
+            for choice_id, change in event_deltas(event).items():
+                changes[resolution, event.question_id, choice_id, start] += change
+    return changes
+
+
+def consume_timeline(batch_size=1000):
+    """Fold the next batch of events into the vote buckets and return how many were read.
+
+    The cursor lock makes this the only writer of the buckets, so they are
+    read, changed and written back with one bulk insert and one bulk update.
+    """
+    with transaction.atomic():
+        cursor, events = pending_events(TIMELINE, batch_size)
+        if not events:
+            return 0
+        changes = timeline_changes(events)
+        existing = {
+            (bucket.resolution, bucket.question_id, bucket.choice_id, bucket.start): bucket
+            for bucket in VoteBucket.objects.filter(
+                choice_id__in={choice_id for _, _, choice_id, _ in changes},
+                start__in={start for _, _, _, start in changes})
+        }
+        created, updated = [], []
+        for key, change in changes.items():
+            bucket = existing.get(key)
+            if bucket is None:
+                resolution, question_id, choice_id, start = key
+                created.append(VoteBucket(resolution=resolution, question_id=question_id,
+                                          choice_id=choice_id, start=start, count=change))
+            elif change:
+                bucket.count += change
+                updated.append(bucket)
+        VoteBucket.objects.bulk_create(created)
+        VoteBucket.objects.bulk_update(updated, ['count'])
+        cursor.position = events[-1].id
+        cursor.save(update_fields=['position'])
+    return len(events)
+
+
+# consumer name -> (consume function, model of its state)
+CONSUMERS = {
+    TIMELINE: (consume_timeline, VoteBucket),
+}
+
+
+def consume_all(consume=consume_timeline, batch_size=1000):
+    """Run a consumer until it has caught up with the log and return how many events it read."""
+    read = 0
+    while True:
+        batch = consume(batch_size)
+        read += batch
+        if batch < batch_size:
+            # a short batch was the end of the log
+            return read
+
+
+def catch_up_timeline(batch_size=1000):
+    """Fold the events the timeline consumer has not read yet and return how many it read.
+
+    Looks for new events without locking first, so a timeline read with
+    nothing to fold does not take the cursor lock.
+    """
+    position = EventCursor.objects.filter(name=TIMELINE).values_list('position', flat=True).first() or 0
+    if not VoteEvent.objects.filter(id__gt=position).exists():
+        return 0
+    return consume_all(consume_timeline, batch_size)
+
+
+def rebuild(name, batch_size=1000):
+    """Drop the state of consumer name and fold the whole event log again."""
+    consume, model = CONSUMERS[name]
+    with transaction.atomic():
+        model.objects.all().delete()
+        EventCursor.objects.update_or_create(name=name, defaults={'position': 0})
+    return consume_all(consume, batch_size)
+
+
+def rebuild_timeline(batch_size=1000):
+    """Drop the vote buckets and fold the whole event log again."""
+    return rebuild(TIMELINE, batch_size)
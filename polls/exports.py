@@ -0,0 +1,185 @@
+"""Compact and bulk formats of poll results.
+
+resultData picks its format from ?format= or else the Accept header:
+
+- json (default): [{choice_text: votes}, ...], as older clients expect
+- columnar: {"ids": [...], "labels": [...], "counts": [...]}, also
+  requested with Accept: application/vnd.polls.columnar+json
+- binary: the counts as packed little-endian unsigned 32 bit integers in
+  choice id order, requested with Accept: application/octet-stream
+
+stream_results() exports the results of every published question as NDJSON, one
+columnar record per line, and stream_votes() exports the raw votes as CSV
+or NDJSON for staff, both without building the export in memory.
+"""
+import csv
+import datetime
+import json
+import struct
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import counters
+from .models import Choice, Vote
+
+FORMATS = ('json', 'columnar', 'binary')
+COLUMNAR_TYPE = 'application/vnd.polls.columnar+json'
+BINARY_TYPE = 'application/octet-stream'
+# rows fetched per query while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+
+def negotiate(request):
+    """Return the results format a request asks for."""
+    requested = request.GET.get('format')
+    if requested in FORMATS:
+        return requested
+    accept = request.headers.get('Accept', '')
+    if BINARY_TYPE in accept:
+        return 'binary'
+    if COLUMNAR_TYPE in accept:
+        return 'columnar'
+    return 'json'
+
+
+def columnar(choices):
+    """Return the tallies of a question as parallel ids, labels and counts."""
+    return {
+        'ids': [choice.id for choice in choices],
+        'labels': [choice.choice_text for choice in choices],
+        'counts': [choice.votes for choice in choices],
+    }
+
+
+def pack_counts(choices):
+    """Return the vote counts of a question packed as little-endian uint32."""
+    return struct.pack(f'<{len(choices)}I', *(choice.votes for choice in choices))
+
+
+def results_response(choices, result_format):
+    """Return the tallies of a question in result_format."""
+    if result_format == 'binary':
+        response = HttpResponse(pack_counts(choices), content_type=BINARY_TYPE)
+    elif result_format == 'columnar':
+        response = JsonResponse(columnar(choices))
+    else:
+        response = JsonResponse([{choice.choice_text: choice.votes} for choice in choices], safe=False)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def result_rows():
+    """Iterate (question id, question text, choice id, choice text, votes) of every published choice, by question."""
+    return (Choice.objects.filter(question__pub_date__lte=timezone.now())
+            .annotate(votes=F('vote_count') + counters.shard_total())
+            .order_by('question_id', 'id')
+            .values_list('question_id', 'question__question_text', 'id', 'choice_text', 'votes')
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+def result_lines():
+    """Yield one NDJSON line of columnar results per question with choices."""
+    for question_id, rows in groupby(result_rows(), key=itemgetter(0)):
+        rows = list(rows)
+        yield json.dumps({
+            'id': question_id,
+            'question_text': rows[0][1],
+            'ids': [row[2] for row in rows],
+            'labels': [row[3] for row in rows],
+            'counts': [row[4] for row in rows],
+        }) + '\n'
+
+
+def stream_results():
+    """Return a streaming NDJSON export of the results of every question."""
+    response = StreamingHttpResponse(result_lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="results.ndjson"'
+    return response
+
+
+VOTE_COLUMNS = ('id', 'voted_at', 'question_id', 'question_text', 'choice_id', 'choice_text',
+                'user_id', 'username')
+VOTE_FIELDS = ('id', 'voted_at', 'question_id', 'question__question_text', 'choice_id',
+               'choice__choice_text', 'user_id', 'user__username')
+VOTE_FORMATS = ('csv', 'ndjson')
+
+
+def parse_bound(value):
+    """Return the aware datetime of an ISO date or datetime, or None if value is empty.
+
+    Raise ValueError if value is not a date.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"{value!r} is not an ISO date or datetime")
+        moment = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def vote_rows(question_ids=None, since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate the raw votes as tuples of VOTE_COLUMNS, by id.
+
+    since is inclusive and until exclusive. Users, questions and choices
+    are joined in the query, so no row triggers a query of its own.
+    """
+    votes = Vote.objects.order_by('id')
+    if question_ids:
+        votes = votes.filter(question_id__in=question_ids)
+    if since is not None:
+        votes = votes.filter(voted_at__gte=since)
+    if until is not None:
+        votes = votes.filter(voted_at__lt=until)
+    return votes.values_list(*VOTE_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def vote_filters(params):
+    """Return the vote_rows filters of ?question=&since=&until= query parameters.
+
+    Raise ValueError if one of them is not valid.
+    """
+    return {
+        'question_ids': [int(question_id) for question_id in params.getlist('question')],
+        'since': parse_bound(params.get('since')),
+        'until': parse_bound(params.get('until')),
+    }
+
+
+class Echo:
+    """File-like object handing back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def vote_lines(rows, vote_format='csv'):
+    """Yield the lines of a vote export, with a header row for CSV."""
+    if vote_format == 'ndjson':
+        for row in rows:
+            record = dict(zip(VOTE_COLUMNS, row))
+            record['voted_at'] = record['voted_at'].isoformat()
+            yield json.dumps(record) + '\n'
+        return
+    writer = csv.writer(Echo())
+    yield writer.writerow(VOTE_COLUMNS)
+    for row in rows:
+        yield writer.writerow((row[0], row[1].isoformat()) + row[2:])
+
+
+def stream_votes(vote_format='csv', **filters):
+    """Return a streaming export of the raw votes matching filters (see vote_rows)."""
+    content_type = 'application/x-ndjson' if vote_format == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(vote_lines(vote_rows(**filters), vote_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="votes.{vote_format}"'
+    return response
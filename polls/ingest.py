@@ -0,0 +1,201 @@
+"""Queue incoming votes in process and write them to the database in batches.
+
+With POLLS_VOTE_INGEST on, the vote view hands votes to a VoteQueue
+instead of running a transaction per request. A background thread flushes
+the queue every POLLS_VOTE_FLUSH_INTERVAL seconds, or as soon as
+POLLS_VOTE_BATCH_SIZE votes are waiting, with one bulk write.
+
+Until its vote is flushed, a voter still reads it back: the pending choice
+is kept in the cache and overlaid on the tallies they are shown.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import IntegrityError, close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache as results_cache
+from . import backends, counters, events, services
+from .models import Choice, Question, Vote, VoteEvent
+
+logger = logging.getLogger('polls')
+
+
+def _pending_key(user_id, question_id):
+    return f'polls:pending-vote:{user_id}:{question_id}'
+
+
+class VoteQueue:
+    """In-process queue of votes waiting to be written."""
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # (user_id, question_id) -> choice_id, a later vote replaces an earlier one
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, user_id, question_id, choice_id):
+        """Queue a vote, flushing right away when the batch is full."""
+        cache.set(_pending_key(user_id, question_id), choice_id, self._pending_timeout())
+        with self._lock:
+            self._pending[(user_id, question_id)] = choice_id
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._start_flusher()
+
+    def flush(self):
+        """Write every queued vote and return how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                written = write_batch(batch)
+            except Exception:
+                # keep the votes for the next flush unless newer ones replaced them
+                with self._lock:
+                    for key, choice_id in batch.items():
+                        self._pending.setdefault(key, choice_id)
+                raise
+            cache.delete_many([_pending_key(*key) for key in batch])
+            return written
+
+    def _pending_timeout(self):
+        # long enough to outlive a few flushes, short enough not to mask a lost batch
+        return max(10 * self.flush_interval, 60)
+
+    def _start_flusher(self):
+        if self.flush_interval <= 0 or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='polls-vote-flusher', daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        event = threading.Event()
+        while not event.wait(self.flush_interval):
+            try:
+                if self.flush():
+                    # fold the new vote events into the timeline off the request path
+                    events.consume_all(events.consume_timeline)
+            except Exception:
+                logger.exception("flushing queued votes failed")
+            finally:
+                close_old_connections()
+
+
+def write_batch(batch):
+    """Write a {(user_id, question_id): choice_id} batch of votes in one transaction.
+
+    Return how many votes were written. Votes that cannot be written even
+    one by one (e.g. their choice was deleted meanwhile) are logged and
+    dropped, so they do not hold back the rest.
+    """
+    written = set(batch)
+    try:
+        with transaction.atomic():
+            deltas = _write_votes(batch)
+    except IntegrityError:
+        # another process stored a vote for one of these users first, or a
+        # vote is no longer valid: fall back to the row-by-row upsert
+        deltas = defaultdict(Counter)
+        for (user_id, question_id), choice_id in batch.items():
+            try:
+                _, old_choice_id = services.cast_vote(User(pk=user_id), Question(pk=question_id),
+                                                      Choice(pk=choice_id))
+            except IntegrityError:
+                logger.warning(f"dropped queued vote of user {user_id} for choice {choice_id} "
+                               f"in question {question_id}, it cannot be written")
+                written.discard((user_id, question_id))
+                continue
+            deltas[question_id].update(counters.vote_deltas(choice_id, old_choice_id))
+    for question_id in {question_id for _, question_id in written}:
+        results_cache.refresh(question_id)
+        backends.publish_vote(question_id, deltas.get(question_id, {}))
+    logger.info(f"flushed {len(written)} queued vote(s)")
+    return len(written)
+
+
+def _write_votes(batch):
+    user_ids = {user_id for user_id, _ in batch}
+    question_ids = {question_id for _, question_id in batch}
+    existing = {
+        (vote.user_id, vote.question_id): vote
+        for vote in Vote.objects.select_for_update().filter(user_id__in=user_ids, question_id__in=question_ids)
+    }
+    now = timezone.now()
+    created, changed, vote_events, deltas = [], [], [], defaultdict(Counter)
+    for (user_id, question_id), choice_id in batch.items():
+        vote = existing.get((user_id, question_id))
+        if vote is None:
+            old_choice_id = None
+            created.append(Vote(user_id=user_id, question_id=question_id, choice_id=choice_id, voted_at=now))
+        elif vote.choice_id != choice_id:
+            old_choice_id, vote.choice_id, vote.voted_at = vote.choice_id, choice_id, now
+            changed.append(vote)
+        else:
+            continue
+        deltas[question_id].update(counters.vote_deltas(choice_id, old_choice_id))
+        vote_events.append(events.vote_event(user_id, question_id, choice_id, old_choice_id))
+    Vote.objects.bulk_create(created)
+    Vote.objects.bulk_update(changed, ['choice', 'voted_at'])
+    VoteEvent.objects.bulk_create(vote_events)
+    for question_deltas in deltas.values():
+        counters.apply(question_deltas)
+    return deltas
+
+
+def overlay_pending(results, user, question_id):
+    """Return results with the not yet flushed vote of user applied."""
+    if not user.is_authenticated:
+        return results
+    pending = cache.get(_pending_key(user.id, question_id))
+    if pending is None:
+        return results
+    stored = Vote.objects.filter(user=user, question_id=question_id).values_list('choice_id', flat=True).first()
+    if stored == pending:
+        return results
+    return [
+        choice._replace(votes=choice.votes + (choice.id == pending) - (choice.id == stored))
+        for choice in results
+    ]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the vote queue of this process."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = VoteQueue(settings.POLLS_VOTE_BATCH_SIZE, settings.POLLS_VOTE_FLUSH_INTERVAL)
+            atexit.register(_queue.flush)
+        return _queue
+
+
+@receiver(setting_changed)
+def reset_queue(setting, **kwargs):
+    """Build a new queue when the ingestion settings change (in tests)."""
+    global _queue
+    if setting.startswith('POLLS_VOTE_'):
+        _queue = None
@@ -0,0 +1,71 @@
+"""Benchmark the polls views against a seeded throwaway database."""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from polls.benchmarks import suite
+
+DEFAULT_BASELINE = Path(suite.__file__).with_name('baseline.json')
+
+
+class Command(BaseCommand):
+    """Report latency, throughput and queries per request of the polls views."""
+
+    help = "Benchmark index, detail, results, resultData and vote and compare with a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=5)
+        parser.add_argument('--votes', type=int, default=200, help="Voters seeded in every question.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests sent to every endpoint.")
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Clients sending page reads at once in the concurrency run.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store this run as the baseline instead of comparing with it.")
+        parser.add_argument('--latency-tolerance', type=float, default=1.0,
+                            help="Allowed latency growth over the baseline, 1.0 is twice as slow.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = suite.run(options['questions'], options['choices'], options['votes'], options['requests'],
+                               options['concurrency'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.print_report(report)
+        if options['save_baseline']:
+            suite.save_baseline(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"baseline saved to {options['baseline']}"))
+            return
+        baseline = suite.load_baseline(options['baseline'])
+        if baseline.get('params') != report['params']:
+            self.stdout.write(self.style.WARNING(
+                f"baseline was run with {json.dumps(baseline.get('params'))}, latencies are not comparable"))
+        regressions = suite.compare(report, baseline, options['latency_tolerance'])
+        if regressions:
+            raise CommandError("regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("no regression against the baseline"))
+
+    def print_report(self, report):
+        self.stdout.write(f"{'path':6} {'endpoint':12} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'queries':>8}")
+        for path in ('wsgi', 'asgi'):
+            for endpoint, stats in report[path].items():
+                self.stdout.write(f"{path:6} {endpoint:12} {stats['p50_ms']:9.3f} {stats['p99_ms']:9.3f} "
+                                  f"{stats['rps']:8.1f} {stats['queries_mean']:8.2f}")
+        self.stdout.write("\nlogged in requests by session store")
+        self.stdout.write(f"{'store':15} {'endpoint':12} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8}")
+        for store, endpoints in report['sessions'].items():
+            for endpoint, stats in endpoints.items():
+                self.stdout.write(f"{store:15} {endpoint:12} {stats['p50_ms']:9.3f} {stats['p99_ms']:9.3f} "
+                                  f"{stats['queries_mean']:8.2f}")
+        self.stdout.write(f"\n{report['params']['concurrency']} concurrent clients reading "
+                          f"{', '.join(suite.CONCURRENT_ENDPOINTS)}")
+        self.stdout.write(f"{'path':19} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+        for path, stats in report['concurrency'].items():
+            self.stdout.write(f"{path:19} {stats['p50_ms']:9.3f} {stats['p99_ms']:9.3f} {stats['rps']:8.1f}")
@@ -0,0 +1,48 @@
+"""Benchmark the cold start of the site against a seeded throwaway database."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from polls.benchmarks import coldstart, suite
+
+
+class Command(BaseCommand):
+    """Report the time from a new process to its first response, full site against API-only."""
+
+    help = ("Time importing mysite/wsgi.py and serving one resultData request in fresh processes, "
+            "and check the API-only profile against POLLS_COLDSTART_BUDGET_MS.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh processes started per profile.")
+        parser.add_argument('--budget-ms', type=int, default=settings.POLLS_COLDSTART_BUDGET_MS)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            question = suite.seed(questions=1)[0]
+            name = str(connection.settings_dict['NAME'])
+            connection.close()
+            # the children open the throwaway database too
+            report = coldstart.run(reverse('polls:resultData', args=(question.id,)), options['runs'],
+                                   env={'SQLITE_NAME': name, 'DB_NAME': name})
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(f"{'profile':8} {'status':>6} {'import ms':>10} {'first response ms':>18} "
+                          f"{'process ms':>11}")
+        for profile in coldstart.PROFILES:
+            stats = report[profile]
+            self.stdout.write(f"{profile:8} {stats['status'][:3]:>6} {stats['import_ms']:10.1f} "
+                              f"{stats['first_response_ms']:18.1f} {stats['process_ms']:11.1f}")
+        for profile in coldstart.PROFILES:
+            self.stdout.write(f"\nslowest imports of {profile}, ms")
+            for package, ms in report[profile]['slowest_imports_ms'].items():
+                self.stdout.write(f"  {package:40} {ms:8.1f}")
+        first_response = report['api']['first_response_ms']
+        if first_response > options['budget_ms']:
+            raise CommandError(f"API-only first response after {first_response} ms, "
+                               f"over the budget of {options['budget_ms']} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"API-only first response after {first_response} ms, within {options['budget_ms']} ms"))
@@ -0,0 +1,26 @@
+"""Fold the sharded vote counters of ended polls back into their choices."""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls import counters
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Compact the ChoiceCounterShard rows into Choice.vote_count."""
+
+    help = "Fold the counter shards of polls whose end_date has passed into their choices."
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help="Only compact the counters of these questions.")
+        parser.add_argument('--all', action='store_true',
+                            help="Compact every question, including polls still open.")
+
+    def handle(self, *args, **options):
+        question_ids = options['question_ids'] or None
+        if question_ids is None and not options['all']:
+            question_ids = list(Question.objects.filter(end_date__lte=timezone.now())
+                                .values_list('id', flat=True))
+        folded = counters.compact(question_ids)
+        self.stdout.write(self.style.SUCCESS(f"folded {folded} counter shard(s)"))
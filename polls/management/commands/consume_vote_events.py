@@ -0,0 +1,33 @@
+"""Fold new vote events into the vote timeline."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import events
+
+
+class Command(BaseCommand):
+    """Read the vote events after each consumer's high-water mark."""
+
+    help = "Fold vote events not yet consumed into the vote buckets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumers', nargs='*',
+                            help=f"Only run these consumers: {', '.join(events.CONSUMERS)}.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events read per transaction.")
+        parser.add_argument('--follow', type=float, metavar='SECONDS',
+                            help="Keep running, polling for new events every SECONDS.")
+
+    def handle(self, *args, **options):
+        names = options['consumers'] or list(events.CONSUMERS)
+        unknown = set(names) - set(events.CONSUMERS)
+        if unknown:
+            raise CommandError(f"unknown consumer(s): {', '.join(sorted(unknown))}")
+        while True:
+            for name in names:
+                consume, _ = events.CONSUMERS[name]
+                read = events.consume_all(consume, options['batch_size'])
+                self.stdout.write(f"{name}: consumed {read} event(s)")
+            if options['follow'] is None:
+                return
+            time.sleep(options['follow'])
@@ -0,0 +1,35 @@
+"""Export the raw votes for analytics."""
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import exports
+
+
+class Command(BaseCommand):
+    """Write every vote as CSV or NDJSON, streaming from the database."""
+
+    help = "Export raw votes (id, time, question, choice, user) as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=exports.VOTE_FORMATS, default='csv')
+        parser.add_argument('--question', type=int, action='append', dest='question_ids',
+                            help="Only export votes in this question, may be repeated.")
+        parser.add_argument('--since', help="Only votes cast at or after this ISO date or datetime.")
+        parser.add_argument('--until', help="Only votes cast before this ISO date or datetime.")
+        parser.add_argument('--output', help="File to write, standard output by default.")
+        parser.add_argument('--chunk-size', type=int, default=exports.EXPORT_CHUNK_SIZE,
+                            help="Votes fetched per query.")
+
+    def handle(self, *args, **options):
+        try:
+            since = exports.parse_bound(options['since'])
+            until = exports.parse_bound(options['until'])
+        except ValueError as error:
+            raise CommandError(error)
+        rows = exports.vote_rows(options['question_ids'], since, until, chunk_size=options['chunk_size'])
+        lines = exports.vote_lines(rows, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,17 @@
+"""Rebuild the vote timeline from the vote event log."""
+from django.core.management.base import BaseCommand
+
+from polls import events
+
+
+class Command(BaseCommand):
+    """Drop the vote buckets and fold every vote event again."""
+
+    help = "Recompute the vote buckets from scratch from the vote events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events read per transaction.")
+
+    def handle(self, *args, **options):
+        read = events.rebuild_timeline(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"rebuilt timeline from {read} event(s)"))
@@ -0,0 +1,23 @@
+"""Rebuild the denormalized vote counters from the Vote table."""
+from django.core.management.base import BaseCommand
+
+from polls import counters
+
+
+class Command(BaseCommand):
+    """Reconcile Choice.vote_count with the votes actually stored."""
+
+    help = "Recount votes per choice and fix the counters that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help="Only reconcile the choices of these questions.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report drifted counters without fixing them.")
+
+    def handle(self, *args, **options):
+        mismatched = counters.rebuild(options['question_ids'], dry_run=options['dry_run'])
+        for choice, stored, actual in mismatched:
+            self.stdout.write(f"choice {choice.pk} ({choice}): {stored} -> {actual}")
+        verb = "found" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(mismatched)} drifted counter(s)"))
@@ -0,0 +1,20 @@
+"""Freeze the results of closed polls into snapshots."""
+from django.core.management.base import BaseCommand
+
+from polls import snapshots
+
+
+class Command(BaseCommand):
+    """Write the missing ResultSnapshot of every poll past its end_date."""
+
+    help = "Snapshot the final tallies of closed polls that have no snapshot yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help="Only snapshot these questions.")
+
+    def handle(self, *args, **options):
+        written = snapshots.snapshot_closed(options['question_ids'])
+        for snapshot in written:
+            self.stdout.write(f"question {snapshot.pk} ({snapshot.question_text}): {snapshot.turnout} vote(s)")
+        self.stdout.write(self.style.SUCCESS(f"wrote {len(written)} snapshot(s)"))
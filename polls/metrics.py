@@ -0,0 +1,205 @@
+"""Per-request timing and query metrics of the polls site.
+
+RequestMetricsMiddleware measures every request: number of SQL queries,
+time spent in SQL, time spent rendering templates and total time. Each
+request is logged to the polls logger as one JSON line and added to
+in-process histograms by resolved URL name, which staff can read at
+polls:metrics.
+
+The middleware runs natively on both the sync and the async path. Queries
+are counted by a wrapper installed on every database connection, which
+reports to the timer of the request in the current context, so queries
+run from sync_to_async threads are counted too.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('polls')
+
+# upper bounds of the histogram buckets, the last bucket is everything above
+TIME_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+# seconds spent rendering templates in the current request
+_render_time = ContextVar('polls_render_time', default=None)
+# SQLTimer of the current request
+_sql_timer = ContextVar('polls_sql_timer', default=None)
+
+
+class TimedTemplate(Template):
+    """Template adding its render time to the current request's metrics."""
+
+    def render(self, context=None, request=None):
+        timer = _render_time.get()
+        if timer is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer[0] += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class SQLTimer:
+    """Database execute wrapper counting and timing queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def record_sql(execute, sql, params, many, context):
+    """Execute wrapper reporting a query to the SQLTimer of the current request."""
+    timer = _sql_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    """Add record_sql to a new database connection (connection_created receiver)."""
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def _histogram(buckets):
+    return [0] * (len(buckets) + 1)
+
+
+class MetricsRegistry:
+    """Aggregated request metrics by URL name."""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, queries, sql_ms, render_ms, total_ms):
+        """Add one request to the metrics of a URL name."""
+        with self._lock:
+            view = self._views.setdefault(name, {
+                'requests': 0,
+                'queries': 0,
+                'sql_ms': 0.0,
+                'render_ms': 0.0,
+                'total_ms': 0.0,
+                'total_ms_histogram': _histogram(TIME_BUCKETS_MS),
+                'queries_histogram': _histogram(QUERY_BUCKETS),
+            })
+            view['requests'] += 1
+            view['queries'] += queries
+            view['sql_ms'] += sql_ms
+            view['render_ms'] += render_ms
+            view['total_ms'] += total_ms
+            view['total_ms_histogram'][bisect.bisect_left(TIME_BUCKETS_MS, total_ms)] += 1
+            view['queries_histogram'][bisect.bisect_left(QUERY_BUCKETS, queries)] += 1
+
+    def snapshot(self):
+        """Return a copy of the metrics, with their histogram bucket bounds."""
+        with self._lock:
+            views = {
+                name: dict(view, total_ms_histogram=list(view['total_ms_histogram']),
+                           queries_histogram=list(view['queries_histogram']))
+                for name, view in self._views.items()
+            }
+        return {'time_buckets_ms': TIME_BUCKETS_MS, 'query_buckets': QUERY_BUCKETS, 'views': views}
+
+    def reset(self):
+        """Forget every recorded request."""
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def query_budget(name):
+    """Return how many queries a URL name may run per request."""
+    return settings.POLLS_QUERY_BUDGETS.get(name, settings.POLLS_QUERY_BUDGET)
+
+
+class RequestMetricsMiddleware:
+    """Measure queries, SQL time, render time and total time of each request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sql, render_timer, tokens = self.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, sql, render_timer, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        sql, render_timer, tokens = self.start()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, sql, render_timer, time.perf_counter() - start)
+
+    def start(self):
+        sql = SQLTimer()
+        render_timer = [0.0]
+        return sql, render_timer, (_sql_timer.set(sql), _render_time.set(render_timer))
+
+    def stop(self, tokens):
+        sql_token, render_token = tokens
+        _sql_timer.reset(sql_token)
+        _render_time.reset(render_token)
+
+    def finish(self, request, response, sql, render_timer, total):
+        match = request.resolver_match
+        name = match.view_name if match else 'unresolved'
+        record = {
+            'view': name,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': sql.count,
+            'sql_ms': round(sql.seconds * 1000, 3),
+            'render_ms': round(render_timer[0] * 1000, 3),
+            'total_ms': round(total * 1000, 3),
+        }
+        registry.record(name, sql.count, record['sql_ms'], record['render_ms'], record['total_ms'])
+        logger.info(f"request {json.dumps(record)}")
+        budget = query_budget(name)
+        if sql.count > budget:
+            logger.warning(f"{name} ran {sql.count} queries, over its budget of {budget}")
+        return response
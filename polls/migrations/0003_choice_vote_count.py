@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_votes(apps, schema_editor):
+    Choice = apps.get_model('polls', 'Choice')
+    for choice in Choice.objects.annotate(actual=Count('vote')).filter(actual__gt=0):
+        Choice.objects.filter(pk=choice.pk).update(vote_count=choice.actual)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_auto_20211025_2042'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 10:30
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def backfill_vote_question(apps, schema_editor):
+    """Fill Vote.question from the choice and drop duplicate votes."""
+    Vote = apps.get_model('polls', 'Vote')
+    Choice = apps.get_model('polls', 'Choice')
+    for choice_id, question_id in Choice.objects.values_list('id', 'question_id'):
+        Vote.objects.filter(choice_id=choice_id).update(question_id=question_id)
+    # a user could end up with more than one vote in a question through the
+    # old check-then-insert race, keep only their latest one
+    duplicates = list(Vote.objects.values('user_id', 'question_id')
+                      .annotate(n=Count('id'), last=Max('id')).filter(n__gt=1))
+    for row in duplicates:
+        (Vote.objects.filter(user_id=row['user_id'], question_id=row['question_id'])
+         .exclude(id=row['last']).delete())
+    if duplicates:
+        for choice in Choice.objects.annotate(actual=Count('vote')):
+            Choice.objects.filter(pk=choice.pk).update(vote_count=choice.actual)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(backfill_vote_question, migrations.RunPython.noop),
+    ]
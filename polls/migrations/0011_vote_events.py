@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def seed_cast_events(apps, schema_editor):
+    """Start the event log with a cast event per existing vote."""
+    Vote = apps.get_model('polls', 'Vote')
+    VoteEvent = apps.get_model('polls', 'VoteEvent')
+    votes = Vote.objects.order_by('voted_at', 'id').values_list('user_id', 'question_id', 'choice_id', 'voted_at')
+    VoteEvent.objects.bulk_create([
+        VoteEvent(kind='cast', user_id=user_id, question_id=question_id, choice_id=choice_id, created=voted_at)
+        for user_id, question_id, choice_id, voted_at in votes.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_vote_voted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionTally',
+            fields=[
+                ('question_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('counts', models.JSONField(default=dict)),
+                ('total', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cast', 'cast'), ('changed', 'changed'), ('retracted', 'retracted')], max_length=10)),
+                ('user_id', models.IntegerField()),
+                ('question_id', models.IntegerField()),
+                ('choice_id', models.IntegerField()),
+                ('previous_choice_id', models.IntegerField(blank=True, null=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question_id', 'id'], name='vote_event_question_idx')],
+            },
+        ),
+        migrations.RunPython(seed_cast_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_vote_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.IntegerField()),
+                ('choice_id', models.IntegerField()),
+                ('resolution', models.PositiveIntegerField(choices=[(60, 'minute'), (3600, 'hour')])),
+                ('start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question_id', 'resolution', 'start'], name='vote_bucket_question_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='votebucket',
+            constraint=models.UniqueConstraint(fields=('resolution', 'choice_id', 'start'), name='unique_vote_bucket'),
+        ),
+    ]
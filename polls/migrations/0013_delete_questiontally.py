@@ -0,0 +1,16 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0012_votebucket'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='QuestionTally',
+        ),
+    ]
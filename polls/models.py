@@ -4,6 +4,30 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+class QuestionQuerySet(models.QuerySet):
+    """Filter questions by their publishing period in SQL."""
+
+    def published(self):
+        """Questions whose pub_date has passed."""
+        return self.filter(pub_date__lte=timezone.now())
+
+    def open_for_voting(self):
+        """Questions that can be voted on now, the SQL form of Question.can_vote."""
+        now = timezone.now()
+        return self.filter(pub_date__lte=now, end_date__gt=now)
+
+    def recent(self):
+        """Questions published within the last day."""
+        now = timezone.now()
+        return self.filter(pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now)
+
+    def with_is_open(self):
+        """Annotate each question with is_open, computed once by the query."""
+        now = timezone.now()
+        return self.annotate(is_open=models.ExpressionWrapper(
+            models.Q(pub_date__lte=now, end_date__gt=now), output_field=models.BooleanField()))
+
+
 class Question(models.Model):
     """Handle question model."""
 
@@ -11,6 +35,15 @@ class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('end date')
+    # last change of the question or its choices, for conditional GETs
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date', 'end_date'], name='question_pub_end_idx'),
+        ]
 
     def __str__(self):
         """Show question text."""
@@ -37,7 +70,8 @@ class Choice(models.Model):
     # Give ForeignKey to show that this class was relate to other class
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
-    # votes = models.IntegerField(default=0)
+    # denormalized counter, maintained by polls.counters when votes change
+    vote_count = models.IntegerField(default=0)
 
     def __str__(self):
         """Show choice text."""
@@ -45,8 +79,39 @@ class Choice(models.Model):
 
     @property
     def votes(self):
-        count = Vote.objects.filter(choice=self).count()
-        return count
+        """Return number of votes for this choice, its counter plus its shards.
+
+        Reads the total annotated as `total` (F('vote_count') + counters.shard_total())
+        or the prefetched counter_shards when present; otherwise this runs a query.
+        """
+        if 'total' in self.__dict__:
+            return self.total
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if 'counter_shards' in prefetched:
+            return self.vote_count + sum(shard.count for shard in prefetched['counter_shards'])
+        shards = self.counter_shards.aggregate(total=models.Sum('count'))['total']
+        return self.vote_count + (shards or 0)
+
+
+class ChoiceCounterShard(models.Model):
+    """One of the rows the vote counter of a popular choice is spread over.
+
+    Writes go to one of POLLS_COUNTER_SHARDS shards so concurrent votes do
+    not all wait on the lock of the choice row. Compaction folds the
+    shards back into Choice.vote_count.
+    """
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'], name='unique_counter_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.choice} shard {self.shard}: {self.count}"
 
 class Vote(models.Model):
     # id = models.AutoField()
@@ -55,7 +120,113 @@ class Vote(models.Model):
             null=False,
             blank=False,
             on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    # when the vote was cast or last changed
+    voted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        # one vote per user in each question
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='unique_vote_per_question'),
+        ]
 
     def __str__(self):
         return f"{self.choice} vote by {self.user.username}"
+
+
+class ResultSnapshot(models.Model):
+    """Final tallies of a poll whose end_date has passed.
+
+    data holds the turnout and, per choice, its id, text, votes and
+    percentage of the turnout, so closed results are read with one primary
+    key lookup instead of recounting the choices.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='snapshot')
+    question_text = models.CharField(max_length=200)
+    data = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Results of {self.question_text}"
+
+    @property
+    def turnout(self):
+        """Return the total number of votes of the poll."""
+        return self.data['turnout']
+
+    def choices(self):
+        """Return the tallies of the poll as ChoiceResult tuples."""
+        from .services import ChoiceResult
+        return [ChoiceResult(c['id'], c['choice_text'], c['votes']) for c in self.data['choices']]
+
+
+class VoteEvent(models.Model):
+    """Append-only record of a vote being cast, changed or retracted.
+
+    Plain id fields instead of foreign keys, so the history outlives the
+    rows it refers to.
+    """
+
+    CAST = 'cast'
+    CHANGED = 'changed'
+    RETRACTED = 'retracted'
+    KINDS = [(CAST, 'cast'), (CHANGED, 'changed'), (RETRACTED, 'retracted')]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    user_id = models.IntegerField()
+    question_id = models.IntegerField()
+    choice_id = models.IntegerField()
+    # the choice a changed vote moved away from
+    previous_choice_id = models.IntegerField(null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['question_id', 'id'], name='vote_event_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} choice {self.choice_id} by user {self.user_id}"
+
+
+class EventCursor(models.Model):
+    """How far a consumer has read the vote events (its high-water mark)."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} at event {self.position}"
+
+
+class VoteBucket(models.Model):
+    """Net change in the votes of a choice during one minute or one hour.
+
+    Folded from the vote events by the timeline consumer, so a poll's
+    timeline is read from a few pre-aggregated rows.
+    """
+
+    MINUTE = 60
+    HOUR = 3600
+    RESOLUTIONS = [(MINUTE, 'minute'), (HOUR, 'hour')]
+
+    question_id = models.IntegerField()
+    choice_id = models.IntegerField()
+    # bucket length in seconds
+    resolution = models.PositiveIntegerField(choices=RESOLUTIONS)
+    start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'choice_id', 'start'], name='unique_vote_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['question_id', 'resolution', 'start'], name='vote_bucket_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"choice {self.choice_id} {self.get_resolution_display()} of {self.start}: {self.count:+d}"
@@ -0,0 +1,138 @@
+"""Rate limiting and duplicate suppression of votes.
+
+A submitted (POSTed) vote is screened before the vote view reads the
+database:
+
+- the same choice submitted again by the same user within
+  POLLS_REPEAT_VOTE_TIMEOUT seconds is answered from a recent-vote cache
+  entry, as a redirect to the results;
+- otherwise it takes a token from the user's bucket and from the bucket
+  of their IP address, and is refused with a 429 when either is empty.
+
+The limiter classes are pluggable through POLLS_VOTE_RATE_LIMITER and,
+for IP addresses, POLLS_VOTE_IP_RATE_LIMITER. The IP limiter lets every
+vote through by default: behind a load balancer or a campus NAT every
+voter has the same REMOTE_ADDR and would share one bucket. A limiter
+is built with a capacity and a refill rate in tokens per second, and its
+acquire(key) returns 0 when the request may go ahead, else the seconds to
+wait. Refusals are logged to the polls logger and counted in `rejections`.
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('polls')
+
+# refused votes of this process by reason
+rejections = Counter()
+_rejections_lock = threading.Lock()
+
+
+class CacheTokenBucket:
+    """Token bucket per key, kept in the configured cache.
+
+    The read and the write of a bucket are not atomic, so concurrent
+    requests may share the last token; good enough to stop bursts.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        # an untouched bucket is full again after this many seconds
+        self.timeout = math.ceil(capacity / rate) + 1
+
+    def acquire(self, key):
+        """Take a token from the bucket of key, return 0 or the seconds until one is available."""
+        cache_key = f'polls:bucket:{key}'
+        now = time.time()
+        tokens, stamp = cache.get(cache_key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - stamp) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        cache.set(cache_key, (tokens, now), self.timeout)
+        return wait
+
+
+class NoRateLimit:
+    """Limiter letting every request through."""
+
+    def __init__(self, capacity, rate):
+        pass
+
+    def acquire(self, key):
+        return 0.0
+
+
+_limiters = None
+
+
+def get_limiters():
+    """Return the (per user, per IP) limiters built from the settings."""
+    global _limiters
+    if _limiters is None:
+        limiter_class = import_string(settings.POLLS_VOTE_RATE_LIMITER)
+        ip_limiter_class = import_string(settings.POLLS_VOTE_IP_RATE_LIMITER)
+        _limiters = (limiter_class(settings.POLLS_VOTE_BURST, settings.POLLS_VOTE_RATE),
+                     ip_limiter_class(settings.POLLS_VOTE_IP_BURST, settings.POLLS_VOTE_IP_RATE))
+    return _limiters
+
+
+@receiver(setting_changed)
+def reset_limiters(setting, **kwargs):
+    """Build new limiters when their settings change (in tests)."""
+    global _limiters
+    if setting.startswith('POLLS_VOTE_'):
+        _limiters = None
+
+
+def _recent_key(user_id, question_id):
+    return f'polls:recent-vote:{user_id}:{question_id}'
+
+
+def remember_vote(user_id, question_id, choice_id):
+    """Remember a vote just cast, so an identical resubmission is short-circuited."""
+    cache.set(_recent_key(user_id, question_id), str(choice_id), settings.POLLS_REPEAT_VOTE_TIMEOUT)
+
+
+def reject(reason, user, ip):
+    """Count and log a refused vote."""
+    with _rejections_lock:
+        rejections[reason] += 1
+        count = rejections[reason]
+    logger.warning(f"vote by {user} from {ip} refused: {reason} ({count} so far)")
+
+
+def screen_vote(request, question_id):
+    """Return the response to a repeated or rate limited vote, or None to let it through."""
+    if request.method != 'POST':
+        # only a submitted vote spends a token
+        return None
+    user = request.user
+    choice_id = request.POST.get('choice')
+    if choice_id is not None and cache.get(_recent_key(user.id, question_id)) == choice_id:
+        with _rejections_lock:
+            rejections['repeat'] += 1
+        logger.info(f"repeated vote by {user} in question {question_id} ignored")
+        return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
+    ip = request.META.get('REMOTE_ADDR')
+    user_limiter, ip_limiter = get_limiters()
+    wait = user_limiter.acquire(f'user:{user.id}') or ip_limiter.acquire(f'ip:{ip}')
+    if wait:
+        reject('rate', user, ip)
+        response = HttpResponse("Too many votes, please try again later.", status=429)
+        response['Retry-After'] = math.ceil(wait)
+        return response
+    return None
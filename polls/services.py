@@ -0,0 +1,76 @@
+"""Read and write services shared by the polls views."""
+from collections import Counter, defaultdict, namedtuple
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import counters, events
+from .models import Choice, ResultSnapshot, Vote, VoteEvent
+
+ChoiceResult = namedtuple('ChoiceResult', ['id', 'choice_text', 'votes'])
+
+# set while delete_votes runs, so the per-vote post_delete receiver leaves its votes alone
+_deleting_votes = ContextVar('polls_deleting_votes', default=False)
+
+
+def deleting_votes():
+    """Return whether delete_votes is deleting votes in this context."""
+    return _deleting_votes.get()
+
+
+def get_results(question_id):
+    """Return every choice of a question with its vote count, in one query."""
+    rows = (Choice.objects.filter(question_id=question_id)
+            .annotate(votes=F('vote_count') + counters.shard_total())
+            .order_by('id')
+            .values_list('id', 'choice_text', 'votes'))
+    return [ChoiceResult(*row) for row in rows]
+
+
+def cast_vote(user, question, choice):
+    """Record the vote of user for choice, replacing their earlier vote in question.
+
+    The vote row is locked (or created) and written in one transaction
+    together with the counters, and the unique (user, question) constraint
+    turns a concurrent double submit into a retry instead of a second vote.
+    Return the vote and the id of the choice it replaced (None if new).
+    """
+    with transaction.atomic():
+        vote, created = Vote.objects.select_for_update().get_or_create(
+            user=user, question=question, defaults={'choice': choice})
+        old_choice_id = None if created else vote.choice_id
+        if old_choice_id is not None and old_choice_id != choice.id:
+            vote.voted_at = timezone.now()
+            Vote.objects.filter(pk=vote.pk).update(choice=choice, voted_at=vote.voted_at)
+        vote.choice = choice
+        counters.record_vote(choice.id, old_choice_id, shard_key=user.pk)
+        events.record_vote(user.pk, question.pk, choice.id, old_choice_id)
+    return vote, old_choice_id
+
+
+def delete_votes(queryset):
+    """Delete the votes of queryset with their counters, events and snapshots in bulk.
+
+    Instead of the post_delete receiver's queries per vote, the retraction
+    events are written with one insert and each choice and snapshot is
+    written once. Return the {question_id: {choice_id: change}} of the
+    deleted votes.
+    """
+    token = _deleting_votes.set(True)
+    try:
+        with transaction.atomic():
+            votes = list(queryset.select_for_update().values_list('user_id', 'question_id', 'choice_id'))
+            queryset.delete()
+            VoteEvent.objects.bulk_create([
+                VoteEvent(kind=VoteEvent.RETRACTED, user_id=user_id, question_id=question_id, choice_id=choice_id)
+                for user_id, question_id, choice_id in votes])
+            counters.retract(Counter(choice_id for _, _, choice_id in votes))
+            deltas = defaultdict(Counter)
+            for _, question_id, choice_id in votes:
+                deltas[question_id][choice_id] -= 1
+            ResultSnapshot.objects.filter(pk__in=deltas).delete()
+    finally:
+        _deleting_votes.reset(token)
+    return deltas
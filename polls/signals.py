@@ -0,0 +1,79 @@
+"""Keep cached pages in step with the questions and choices they show, and log logins."""
+import logging
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, counters, events, services, snapshots
+from .auth import forget_user
+from .models import Choice, Question, Vote
+
+logger = logging.getLogger('polls')
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Expire the index, the results and the results snapshot of a changed question."""
+    cache.bump_index_version()
+    cache.bump_version(instance.pk)
+    if kwargs.get('signal') is post_save:
+        # a reopened or renamed poll is snapshotted again once it closes
+        snapshots.discard(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, raw=False, **kwargs):
+    """Mark the question of a changed choice as modified and drop its results snapshot."""
+    if not raw:
+        Question.objects.filter(pk=instance.question_id).update(modified=timezone.now())
+        snapshots.discard(instance.question_id)
+    cache.bump_version(instance.question_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Forget the cached copy of a changed user, e.g. after a password change."""
+    forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=Vote)
+def vote_deleted(sender, instance, **kwargs):
+    """Take a deleted vote off its counter and results, and log it as retracted.
+
+    Also runs for votes deleted with their user, question or choice.
+    services.delete_votes does the same in bulk for the votes it deletes.
+    """
+    if services.deleting_votes():
+        return
+    counters.retract({instance.choice_id: 1})
+    events.record_retraction(instance.user_id, instance.question_id, instance.choice_id)
+    snapshots.discard(instance.question_id)
+    transaction.on_commit(partial(cache.bump_version, instance.question_id))
+
+
+@receiver(user_logged_in)
+def user_logged_in_callback(sender, request, user, **kwargs):
+    """Log a login with the address it came from."""
+    # to cover more complex cases:
+    # http://stackoverflow.com/questions/4581789/how-do-i-get-user-ip-address-in-django
+    ip = request.META.get('REMOTE_ADDR')
+    logger.info(f"{user} logged in from {ip}")
+
+
+@receiver(user_logged_out)
+def user_logged_out_callback(sender, request, user, **kwargs):
+    """Log a logout with the address it came from."""
+    ip = request.META.get('REMOTE_ADDR')
+    logger.info(f'logout user: {user} via ip: {ip}')
+
+
+@receiver(user_login_failed)
+def user_login_failed_callback(sender, credentials, request, **kwargs):
+    """Log a failed login attempt with the address it came from."""
+    ip = request.META.get('REMOTE_ADDR')
+    logger.warning(f"Invalid login attempt for {credentials} from {ip}")
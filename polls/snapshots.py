@@ -0,0 +1,78 @@
+"""Frozen results of closed polls.
+
+Once a question's end_date has passed its tallies can no longer change, so
+they are written once to a ResultSnapshot, by the snapshot_results command
+or on the first read after closing, and read from there afterwards.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import cache, services
+from .models import Question, ResultSnapshot
+
+
+def build(question):
+    """Write the missing snapshot of question from its current tallies and return it."""
+    choices = services.get_results(question.id)
+    turnout = sum(choice.votes for choice in choices)
+    data = {
+        'turnout': turnout,
+        'choices': [
+            {
+                'id': choice.id,
+                'choice_text': choice.choice_text,
+                'votes': choice.votes,
+                'percent': round(100 * choice.votes / turnout, 1) if turnout else 0.0,
+            }
+            for choice in choices
+        ],
+    }
+    try:
+        with transaction.atomic():
+            snapshot = ResultSnapshot.objects.create(
+                question=question, question_text=question.question_text, data=data)
+        # pages and ETags of the still open poll are stale now
+        cache.bump_version(question.id)
+    except IntegrityError:
+        # another reader snapshotted the poll first
+        snapshot = ResultSnapshot.objects.get(pk=question.pk)
+    question.snapshot = snapshot
+    return snapshot
+
+
+def for_question(question):
+    """Return the snapshot of a closed question, writing it if missing, or None if still open.
+
+    Load question with select_related('snapshot') to avoid a query.
+    """
+    try:
+        return question.snapshot
+    except ResultSnapshot.DoesNotExist:
+        pass
+    if question.end_date > timezone.now():
+        return None
+    return build(question)
+
+
+def get_results(question_id):
+    """Return the tallies of a question, from its snapshot once closed, or None if there is no such question."""
+    question = Question.objects.select_related('snapshot').filter(pk=question_id).first()
+    if question is None:
+        return None
+    snapshot = for_question(question)
+    if snapshot is not None:
+        return snapshot.choices()
+    return services.get_results(question_id)
+
+
+def snapshot_closed(question_ids=None):
+    """Write the missing snapshots of closed questions and return them."""
+    questions = Question.objects.filter(end_date__lte=timezone.now(), snapshot__isnull=True)
+    if question_ids:
+        questions = questions.filter(pk__in=question_ids)
+    return [build(question) for question in questions]
+
+
+def discard(question_id):
+    """Drop the snapshot of a question whose tallies or text changed."""
+    ResultSnapshot.objects.filter(pk=question_id).delete()
@@ -0,0 +1,100 @@
+// Results charts of a question: live vote counts and the vote timeline.
+// The question id comes from the data-question-id attribute of the body,
+// data-live-stream is set where the page is served under ASGI and the
+// counts can be followed over the results stream.
+var state={
+  'ids':[],
+  'items':[],
+  'values':[],
+  }
+var objId = document.body.dataset.questionId
+var dataURL = `/polls/resultdata/${objId}/`
+var streamURL = `/polls/${objId}/stream/`
+
+if (window.EventSource && 'liveStream' in document.body.dataset) {
+  // live counts: a snapshot first, then {choice_id: change} deltas
+  var source = new EventSource(streamURL)
+  source.addEventListener('snapshot', function(event){
+    var data = JSON.parse(event.data)
+    state.ids = data.ids
+    state.items = data.labels
+    state.values = data.counts
+    buildChart()
+  })
+  source.addEventListener('delta', function(event){
+    var deltas = JSON.parse(event.data)
+    for (var id in deltas){
+      var i = state.ids.indexOf(Number(id))
+      if (i >= 0){
+        state.values[i] += deltas[id]
+        $(`#votes-${id}`).text(state.values[i])
+      }
+    }
+    buildChart()
+  })
+} else {
+  $.ajax({
+    method:'GET',
+    url:dataURL,
+    data:{'format':'columnar'},
+    success:function(response){
+      state.ids = response.ids
+      state.items = response.labels
+      state.values = response.counts
+      buildChart()
+    }
+
+  })
+}
+$.ajax({
+  method:'GET',
+  url:`/polls/timelinedata/${objId}/`,
+  success:function(response){
+    // running totals: votes before the range plus the changes slot by slot
+    var series = response.counts.map(function(changes, i){
+      var total = response.base[i]
+      return {
+        'text': response.labels[i],
+        'values': changes.map(function(change){ total += change; return total })
+      }
+    })
+    zingchart.render({
+      id: "timelineChart",
+      data: {
+        "type": "line",
+        "scale-x": {
+          "min-value": response.start * 1000,
+          "step": response.step * 1000,
+          "transform": {"type": "date"}
+        },
+        "series": series
+      },
+      height: 300,
+      width: '40%',
+    })
+  }
+})
+
+function buildChart(){
+  var chartData = {
+    "type" : "bar",
+    "scale-x":{
+      "values":state.items
+    },
+    "series":[
+      {
+          "values":state.values
+      }
+    ]
+
+  }
+
+  zingchart.render({
+    id: "myChart",
+    data: chartData,
+    height: 400,
+    width: '40%',
+
+  });
+
+}
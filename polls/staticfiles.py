@@ -0,0 +1,102 @@
+"""Bundled, minified and content-hashed static files of the polls app.
+
+POLLS_STATIC_BUNDLES maps a bundle name to the static files it joins, in
+order. BundledManifestStorage, the STATICFILES_STORAGE outside DEBUG,
+writes every bundle minified into STATIC_ROOT during collectstatic, then
+ManifestStaticFilesStorage gives the bundles and every other file a
+content-hashed name recorded in staticfiles.json. The {% bundle %} tag
+links the bundle once it is collected and its source files everywhere
+else, so development serves the files as written. Files missing from the
+manifest, as in tests that never run collectstatic, keep their plain name.
+"""
+import functools
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.utils.cache import patch_cache_control
+from django.views.static import serve as serve_file
+
+
+def minify_css(text):
+    """Drop the comments and the whitespace a stylesheet does not need."""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Drop the comment lines, indentation and blank lines of a script.
+
+    Line breaks are kept, so statements without semicolons still end
+    where they did.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def minify(name, text):
+    """Minify the text of a static file by its type; .min. files already are."""
+    if '.min.' in name:
+        return text.strip()
+    if name.endswith('.css'):
+        return minify_css(text)
+    if name.endswith('.js'):
+        return minify_js(text)
+    return text
+
+
+def bundle_content(name, sources):
+    """Return the minified text of a bundle joining the static files sources."""
+    parts = []
+    for source in sources:
+        path = finders.find(source)
+        if path is None:
+            raise ValueError(f"bundle {name} includes {source}, which is not a static file")
+        with open(path, encoding='utf-8') as file:
+            parts.append(minify(source, file.read()))
+    # a script without a final semicolon must not run into the next one
+    return ('\n;\n' if name.endswith('.js') else '\n').join(parts) + '\n'
+
+
+class BundledManifestStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes the bundles of POLLS_STATIC_BUNDLES."""
+
+    builds_bundles = True
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # not collected yet, link the plain name the finders still serve
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name, sources in settings.POLLS_STATIC_BUNDLES.items():
+                if self.exists(name):
+                    self.delete(name)
+                self._save(name, ContentFile(bundle_content(name, sources).encode()))
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+
+
+@functools.lru_cache(maxsize=None)
+def hashed_names():
+    """Return the content-hashed names of the collected static files."""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def serve(request, path):
+    """Serve a file of STATIC_ROOT, kept by browsers for POLLS_STATIC_MAX_AGE when its name is hashed."""
+    response = serve_file(request, path, document_root=settings.STATIC_ROOT)
+    if path in hashed_names():
+        patch_cache_control(response, public=True, max_age=settings.POLLS_STATIC_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
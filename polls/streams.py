@@ -0,0 +1,72 @@
+"""Fan vote count changes out to the live results streams of this process.
+
+Every open stream of a question subscribes to the broadcaster with its own
+asyncio queue. A vote publishes one {choice_id: change} mapping per
+question, which is handed to every subscriber's event loop, so streams
+never read the database to follow the counts.
+"""
+import asyncio
+import threading
+
+# pending deltas a stream may fall behind by before it is told to resync
+QUEUE_SIZE = 100
+
+
+class Broadcaster:
+    """In-process publish/subscribe of vote count changes by question."""
+
+    def __init__(self):
+        # question_id -> {queue: loop}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, question_id):
+        """Return a queue receiving the count changes of a question."""
+        queue = asyncio.Queue(QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(int(question_id), {})[queue] = loop
+        return queue
+
+    def unsubscribe(self, question_id, queue):
+        """Stop sending count changes to queue."""
+        with self._lock:
+            subscribers = self._subscribers.get(int(question_id), {})
+            subscribers.pop(queue, None)
+            if not subscribers:
+                self._subscribers.pop(int(question_id), None)
+
+    def subscriber_count(self, question_id):
+        """Return how many streams follow a question."""
+        with self._lock:
+            return len(self._subscribers.get(int(question_id), {}))
+
+    def publish(self, question_id, deltas):
+        """Send a {choice_id: change} mapping to every stream of a question.
+
+        Safe to call from any thread, including sync views.
+        """
+        deltas = {choice_id: change for choice_id, change in deltas.items() if change}
+        if not deltas:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.get(int(question_id), {}).items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, deltas)
+            except RuntimeError:
+                # the loop of that stream is gone
+                self.unsubscribe(question_id, queue)
+
+
+def _offer(queue, deltas):
+    try:
+        queue.put_nowait(deltas)
+    except asyncio.QueueFull:
+        # the stream fell behind, drop its backlog and ask it to resync
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,26 @@
+"""Template tag linking the static bundles of polls.staticfiles."""
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+register = template.Library()
+
+SCRIPT = '<script src="{}"></script>'
+STYLESHEET = '<link rel="stylesheet" type="text/css" href="{}">'
+
+
+@register.simple_tag
+def bundle(name):
+    """Link a bundle of POLLS_STATIC_BUNDLES, or its source files where no collected bundle exists.
+
+    Bundles are linked once collectstatic built them: the storage builds
+    bundles and its manifest lists this one.
+    """
+    if getattr(staticfiles_storage, 'builds_bundles', False) and name in staticfiles_storage.hashed_files:
+        sources = [name]
+    else:
+        sources = settings.POLLS_STATIC_BUNDLES[name]
+    return format_html_join('\n', SCRIPT if name.endswith('.js') else STYLESHEET,
+                            ((static(source),) for source in sources))
@@ -0,0 +1,132 @@
+"""Test the admin changelists of ku-polls."""
+
+import datetime
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from polls import admin as polls_admin, snapshots
+from polls.models import Question, ResultSnapshot, Vote, VoteEvent
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+def create_votes(question, voters):
+    """Create `voters` users voting for the choices of question in turn."""
+    choices = list(question.choice_set.all())
+    start = User.objects.count()
+    users = User.objects.bulk_create([User(username=f"voter{start + n}") for n in range(voters)])
+    Vote.objects.bulk_create([Vote(user=user, question=question, choice=choices[n % len(choices)])
+                              for n, user in enumerate(users)])
+    for choice in choices:
+        choice.vote_count = choice.vote_set.count()
+        choice.save()
+
+
+class AdminChangelistTests(TestCase):
+    """Test that changelists do not run a query per row."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "admin-pass-123")
+        self.client.force_login(self.admin)
+        self.question = create_question("Admin question", days=-1, end=5)
+        for n in range(3):
+            self.question.choice_set.create(choice_text=f"choice {n}")
+
+    def assertConstantQueries(self, url, grow):
+        """Assert url runs as many queries before and after grow() adds rows."""
+        # load the cached user first
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        grow()
+        with self.assertNumQueries(len(before)):
+            self.client.get(url)
+
+    def test_vote_changelist(self):
+        """The vote changelist joins users, questions and choices."""
+        create_votes(self.question, 5)
+        self.assertConstantQueries(reverse('admin:polls_vote_changelist'),
+                                   lambda: create_votes(self.question, 80))
+
+    def test_question_changelist(self):
+        """Question vote totals are annotated, not counted per row."""
+        self.assertConstantQueries(reverse('admin:polls_question_changelist'),
+                                   lambda: [create_question(f"More {n}", days=-1) for n in range(20)])
+
+    def test_question_totals(self):
+        """The changelist and the choice inline show vote totals."""
+        create_votes(self.question, 6)
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        self.assertContains(response, '<td class="field-total_votes">6</td>', html=True)
+        response = self.client.get(reverse('admin:polls_question_change', args=(self.question.id,)))
+        self.assertContains(response, "choice 2")
+
+    @override_settings(POLLS_ADMIN_ESTIMATED_COUNT=10)
+    def test_estimated_count(self):
+        """Large unfiltered tables are paginated from an estimate, filtered ones are counted."""
+        create_votes(self.question, 30)
+        last_id = Vote.objects.order_by('-id').first().id
+        Vote.objects.filter(pk=last_id - 1).delete()
+        paginator = polls_admin.EstimatedCountPaginator(Vote.objects.order_by('id'), 10)
+        self.assertEqual(paginator.count, last_id)
+        filtered = polls_admin.EstimatedCountPaginator(Vote.objects.filter(question=self.question), 10)
+        self.assertEqual(filtered.count, 29)
+
+    def test_delete_vote_updates_counter(self):
+        """Deleting votes in the admin takes them off the counters."""
+        create_votes(self.question, 3)
+        vote = Vote.objects.first()
+        self.client.post(reverse('admin:polls_vote_delete', args=(vote.id,)), {'post': 'yes'})
+        vote.choice.refresh_from_db()
+        self.assertEqual(vote.choice.votes, 0)
+
+    def test_vote_choice_of_other_question(self):
+        """The vote form refuses a choice of another question."""
+        other = create_question("Other question", days=-1, end=5)
+        choice = other.choice_set.create(choice_text="elsewhere")
+        user = User.objects.create_user("voter")
+        form = polls_admin.VoteAdminForm({'user': user.id, 'question': self.question.id, 'choice': choice.id,
+                                          'voted_at_0': '2020-01-01', 'voted_at_1': '00:00:00'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('choice', form.errors)
+
+    def test_bulk_delete_constant_queries(self):
+        """Deleting votes from the changelist writes their bookkeeping in bulk, not per vote."""
+        def delete_all():
+            # the admin log row of each deleted object is Django's own
+            votes = Vote.objects.filter(question=self.question)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('admin:polls_vote_changelist'), {
+                    'action': 'delete_selected', 'post': 'yes',
+                    '_selected_action': list(votes.values_list('pk', flat=True))})
+            return len([query for query in queries if '"polls_' in query['sql']])
+        create_votes(self.question, 3)
+        few = delete_all()
+        create_votes(self.question, 20)
+        self.assertEqual(delete_all(), few)
+        self.assertEqual(VoteEvent.objects.filter(kind=VoteEvent.RETRACTED).count(), 23)
+        self.assertEqual(sum(choice.votes for choice in self.question.choice_set.all()), 0)
+
+    def test_delete_vote_discards_snapshot(self):
+        """Deleting votes of a closed poll drops its stale snapshot."""
+        closed = create_question("Closed question", days=-3, end=1)
+        closed.choice_set.create(choice_text="closed choice")
+        create_votes(closed, 2)
+        snapshots.build(closed)
+        vote = Vote.objects.filter(question=closed).first()
+        self.client.post(reverse('admin:polls_vote_delete', args=(vote.id,)), {'post': 'yes'})
+        self.assertFalse(ResultSnapshot.objects.filter(pk=closed.pk).exists())
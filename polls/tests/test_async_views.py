@@ -0,0 +1,81 @@
+"""Test the async views of ku-polls."""
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import datetime
+from django.utils import timezone
+from polls import async_views
+from polls.models import Question
+from django.urls import resolve, reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+@override_settings(POLLS_ASYNC_VIEWS=True)
+class AsyncViewTests(TestCase):
+    """Test the pages served by polls.async_views."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Async question", days=-1, end=5)
+        self.choice = self.question.choice_set.create(choice_text="async choice")
+
+    def test_async_views_routed(self):
+        """POLLS_ASYNC_VIEWS serves the pages from the async views."""
+        self.assertIs(resolve(reverse('polls:index')).func, async_views.index)
+
+    async def test_index(self):
+        """The index lists published questions."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, "Async question")
+
+    async def test_detail_closed_redirects(self):
+        """A closed question redirects to the index."""
+        closed = await Question.objects.acreate(question_text="Closed", pub_date=timezone.now(),
+                                                end_date=timezone.now() - datetime.timedelta(days=1))
+        response = await self.async_client.get(reverse('polls:detail', args=(closed.id,)))
+        self.assertRedirects(response, reverse('polls:index'), fetch_redirect_response=False)
+
+    async def test_results_missing_question(self):
+        """The results of a question that does not exist are a 404."""
+        response = await self.async_client.get(reverse('polls:results', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_result_data_not_modified(self):
+        """resultData answers conditional GETs."""
+        url = reverse('polls:resultData', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json(), [{"async choice": 0}])
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_vote_requires_login(self):
+        """An anonymous vote is sent to the login page."""
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                                {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith('/accounts/login/'))
+
+    def test_vote(self):
+        """A logged in vote is counted and redirects to the results."""
+        user = User.objects.create_user(username="voter", password="voter-pass-123")
+        self.async_client.force_login(user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = async_to_sync(self.async_client.post)(url, {'choice': self.choice.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 1)
@@ -5,7 +5,7 @@ from django.urls import reverse
 
 import datetime
 from django.utils import timezone
-from polls.models import Question
+from polls.models import Question, Vote
 
 
 def create_question(question_text, days, end=1):
@@ -63,10 +63,19 @@ class UserAuthTest(TestCase):
     def test_authenticate_vote(self):
         """Test that authenticated user be able to vote."""
         self.client.login(username=self.username, password=self.password)
-        question = create_question(question_text='This is a question', days=-5)
+        question = create_question(question_text='This is a question', days=-1, end=5)
         response = self.client.get(reverse('polls:vote', args=(question.id,)))
         self.assertEqual(200, response.status_code)
 
+    def test_vote_closed_question(self):
+        """Test that a vote in a closed poll is sent back to the index."""
+        self.client.login(username=self.username, password=self.password)
+        question = create_question(question_text='This is a question', days=-5)
+        choice = question.choice_set.create(choice_text='choice')
+        response = self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertFalse(Vote.objects.exists())
+
     def test_non_authenticate_vote(self):
         """Test the outsider vote."""
         question = create_question(question_text='This is a question', days=-5)
@@ -0,0 +1,102 @@
+"""Test the vote changes backends of ku-polls."""
+
+import os
+import tempfile
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import datetime
+from django.utils import timezone
+from polls import backends
+from polls import cache as results_cache
+from polls.backends.sqlite import SQLiteBackend
+from polls.models import Question
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class SQLiteBackendTests(TestCase):
+    """Test passing changes between nodes through a SQLite file."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'pubsub.sqlite3')
+
+    def node(self):
+        backend = SQLiteBackend(self.path, poll_interval=None)
+        self.addCleanup(backend.close)
+        received = []
+        backend.subscribe(lambda question_id, deltas, local: received.append((question_id, deltas, local)))
+        return backend, received
+
+    def test_publish_reaches_every_node_once(self):
+        """The publishing node gets its change at once, the others when they poll."""
+        first, first_received = self.node()
+        second, second_received = self.node()
+        first.publish(1, {10: 1, 11: -1})
+        self.assertEqual(first_received, [(1, {10: 1, 11: -1}, True)])
+        self.assertEqual(second.poll(), 1)
+        self.assertEqual(second_received, [(1, {10: 1, 11: -1}, False)])
+        first.poll()
+        self.assertEqual(len(first_received), 1)
+
+    def test_new_node_skips_old_messages(self):
+        """A node starting up only follows the changes published after it."""
+        first, _ = self.node()
+        first.publish(1, {10: 1})
+        second, second_received = self.node()
+        second.poll()
+        self.assertEqual(second_received, [])
+
+
+class VoteFanOutTests(TestCase):
+    """Test that votes reach the results cache and streams of every node."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        options = {'path': os.path.join(directory.name, 'pubsub.sqlite3'), 'poll_interval': None}
+        settings = override_settings(POLLS_PUBSUB_BACKEND='polls.backends.sqlite.SQLiteBackend',
+                                     POLLS_PUBSUB_OPTIONS=options)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.this_node = backends.get_backend()
+        self.other_node = SQLiteBackend(**options)
+        self.addCleanup(self.other_node.close)
+        self.question = create_question("Question", days=-1, end=5)
+        self.choice = self.question.choice_set.create(choice_text="choice")
+
+    def test_vote_is_published(self):
+        """A vote cast on this node reaches the streams of another node."""
+        received = []
+        self.other_node.subscribe(lambda question_id, deltas, local: received.append((question_id, deltas)))
+        User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.login(username="voter", password="voter-pass-123")
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.other_node.poll()
+        self.assertEqual(received, [(self.question.id, {self.choice.id: 1})])
+
+    def test_vote_on_another_node_expires_tallies(self):
+        """Tallies cached in this process are reloaded after another node's vote."""
+        self.assertEqual(results_cache.get_results(self.question.id)[0].votes, 0)
+        # the vote another node wrote to the shared database
+        self.question.choice_set.update(vote_count=1)
+        version = results_cache.get_version(self.question.id)
+        self.other_node.publish(self.question.id, {self.choice.id: 1})
+        self.this_node.poll()
+        self.assertNotEqual(results_cache.get_version(self.question.id), version)
+        self.assertEqual(results_cache.get_results(self.question.id)[0].votes, 1)
@@ -0,0 +1,39 @@
+"""Test the benchmark suite and the query budget it stores."""
+
+from django.test import TransactionTestCase
+from polls.benchmarks import suite
+from polls.management.commands.benchmark import DEFAULT_BASELINE
+
+
+class BenchmarkSuiteTests(TransactionTestCase):
+    """Run a tiny benchmark and hold it to the stored baseline.
+
+    Not wrapped in a transaction, so queries are counted as in production.
+    """
+
+    def test_report(self):
+        """The report covers every endpoint on both client paths."""
+        report = suite.run(questions=2, choices=3, votes=4, requests=6, concurrency=2)
+        for path in ('wsgi', 'asgi'):
+            self.assertEqual(set(report[path]), set(suite.ENDPOINTS))
+            for stats in report[path].values():
+                self.assertEqual(stats['requests'], 6)
+                self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        for stats in report['concurrency'].values():
+            self.assertEqual(stats['requests'], 6)
+        # cached sessions and users take the session and user queries off every request
+        sessions = report['sessions']
+        for endpoint in suite.SESSION_ENDPOINTS:
+            self.assertLess(sessions['cache'][endpoint]['queries_mean'], sessions['db'][endpoint]['queries_mean'])
+            self.assertLess(sessions['signed_cookies'][endpoint]['queries_mean'],
+                            sessions['db'][endpoint]['queries_mean'])
+        # latencies of a tiny run say nothing, but queries per request must hold
+        regressions = suite.compare(report, suite.load_baseline(DEFAULT_BASELINE), latency_tolerance=float('inf'))
+        self.assertEqual(regressions, [])
+
+    def test_compare_flags_regressions(self):
+        """More queries or a slower p99 than the baseline is a regression."""
+        stats = {'p50_ms': 1.0, 'p99_ms': 2.0, 'queries_max': 1}
+        baseline = {'wsgi': {'index': stats}}
+        report = {'wsgi': {'index': dict(stats, p99_ms=5.0, queries_max=2)}}
+        self.assertEqual(len(suite.compare(report, baseline, latency_tolerance=1.0)), 2)
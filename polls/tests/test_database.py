@@ -0,0 +1,67 @@
+"""Test the SQLite database profile under concurrent voters."""
+
+import threading
+import unittest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase
+import datetime
+from django.utils import timezone
+from polls import services
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "tests the SQLite profile")
+class ConcurrentVoteTests(TransactionTestCase):
+    """Test that concurrent voters do not hit "database is locked"."""
+
+    voters = 16
+    rounds = 5
+
+    def test_pragmas_applied(self):
+        """New connections use WAL journaling and wait for the write lock."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0].lower(), 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_concurrent_voters(self):
+        """Voters changing their votes at the same time all succeed."""
+        question = create_question("Busy question", days=-1, end=5)
+        choices = [question.choice_set.create(choice_text=f"choice {n}") for n in range(3)]
+        users = [User.objects.create_user(username=f"voter{n}") for n in range(self.voters)]
+        errors = []
+        barrier = threading.Barrier(self.voters)
+
+        def vote(n, user):
+            try:
+                barrier.wait()
+                for r in range(self.rounds):
+                    services.cast_vote(user, question, choices[(n + r) % len(choices)])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(n, user)) for n, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.count(), self.voters)
+        self.assertEqual(sum(choice.votes for choice in question.choice_set.all()), self.voters)
@@ -0,0 +1,140 @@
+"""Test the vote event log and the timelines folded from it."""
+
+from io import StringIO
+import datetime
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from polls import events, services
+from polls.models import Question, Vote, VoteBucket, VoteEvent
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class VoteEventTests(TestCase):
+    """Test event recording and the timeline consumer."""
+
+    def setUp(self):
+        self.question = create_question("Event question", days=-1, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.users = [User.objects.create_user(username=f"voter{n}") for n in range(3)]
+
+    def bucket_counts(self):
+        """Return the {choice_id: votes} of the question summed from its hour buckets."""
+        counts = {}
+        for choice_id, count in VoteBucket.objects.filter(
+                question_id=self.question.id, resolution=VoteBucket.HOUR).values_list('choice_id', 'count'):
+            counts[choice_id] = counts.get(choice_id, 0) + count
+        return counts
+
+    def test_events_recorded(self):
+        """Casting, changing and deleting a vote append cast, changed and retracted events."""
+        services.cast_vote(self.users[0], self.question, self.choice1)
+        services.cast_vote(self.users[0], self.question, self.choice1)
+        services.cast_vote(self.users[0], self.question, self.choice2)
+        Vote.objects.get(user=self.users[0]).delete()
+        kinds = list(VoteEvent.objects.order_by('id').values_list('kind', 'choice_id', 'previous_choice_id'))
+        self.assertEqual(kinds, [
+            ('cast', self.choice1.id, None),
+            ('changed', self.choice2.id, self.choice1.id),
+            ('retracted', self.choice2.id, None),
+        ])
+
+    def test_consume_incrementally(self):
+        """The consumer folds only the events after its high-water mark."""
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice1)
+        self.assertEqual(events.consume_all(), 3)
+        services.cast_vote(self.users[0], self.question, self.choice2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(events.consume_all(), 1)
+        self.assertFalse([query for query in queries if '"polls_vote"' in query['sql']])
+        self.assertEqual(self.bucket_counts(), {self.choice1.id: 2, self.choice2.id: 1})
+        self.assertEqual(events.consume_all(), 0)
+
+    def test_rebuild_command(self):
+        """rebuild_timeline recomputes the vote buckets from the whole log."""
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice2)
+        call_command('consume_vote_events', stdout=StringIO())
+        VoteBucket.objects.update(count=0)
+        out = StringIO()
+        call_command('rebuild_timeline', stdout=out)
+        self.assertIn("rebuilt timeline from 3 event(s)", out.getvalue())
+        self.assertEqual(self.bucket_counts(), {self.choice2.id: 3})
+
+
+class VoteTimelineTests(TestCase):
+    """Test the vote buckets and the timeline endpoint."""
+
+    def setUp(self):
+        self.question = create_question("Timeline question", days=-2, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.start = self.question.pub_date.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        for n, (minutes, choice) in enumerate([(0, self.choice1), (0, self.choice1), (5, self.choice2)]):
+            VoteEvent.objects.create(kind='cast', user_id=n, question_id=self.question.id, choice_id=choice.id,
+                                     created=self.start + datetime.timedelta(minutes=minutes, seconds=n))
+        VoteEvent.objects.create(kind='changed', user_id=0, question_id=self.question.id, choice_id=self.choice2.id,
+                                 previous_choice_id=self.choice1.id,
+                                 created=self.start + datetime.timedelta(minutes=90))
+        events.consume_all(events.consume_timeline)
+
+    def url(self, **params):
+        return reverse('polls:timelineData', args=(self.question.id,)) + '?' + urlencode(params)
+
+    def test_timeline_read_catches_up(self):
+        """Votes leave the buckets alone, and a timeline read folds them in first."""
+        voter = User.objects.create_user(username="bucket-voter")
+        bucket = VoteBucket.objects.filter(resolution=VoteBucket.MINUTE, choice_id=self.choice2.id,
+                                           start=events.bucket_start(timezone.now(), VoteBucket.MINUTE))
+        services.cast_vote(voter, self.question, self.choice2)
+        self.assertFalse(bucket.exists())
+        data = self.client.get(self.url()).json()
+        self.assertEqual(bucket.get().count, 1)
+        self.assertEqual(sum(data['counts'][1]) + data['base'][1], 3)
+
+    def test_buckets(self):
+        """Events are folded into minute and hour buckets per choice."""
+        minutes = VoteBucket.objects.filter(resolution=VoteBucket.MINUTE, choice_id=self.choice1.id)
+        self.assertEqual(sorted(minutes.values_list('count', flat=True)), [-1, 2])
+        hours = VoteBucket.objects.filter(resolution=VoteBucket.HOUR, choice_id=self.choice2.id)
+        self.assertEqual(sum(hours.values_list('count', flat=True)), 2)
+
+    def test_minute_timeline(self):
+        """A short range is returned per minute, with the votes from before it as base."""
+        since = self.start + datetime.timedelta(minutes=3)
+        data = self.client.get(self.url(since=since.isoformat(), until=(since + datetime.timedelta(minutes=10))
+                                        .isoformat())).json()
+        self.assertEqual(data['step'], 60)
+        self.assertEqual(data['base'], [2, 0])
+        self.assertEqual(data['counts'][1][2], 1)
+        self.assertEqual(len(data['counts'][0]), 11)
+
+    def test_downsampled_timeline(self):
+        """A long range is read from hour buckets and merged down to the points asked for."""
+        data = self.client.get(self.url(points=10)).json()
+        self.assertEqual(data['step'] % 3600, 0)
+        self.assertLessEqual(len(data['counts'][0]), 10)
+        self.assertEqual([sum(counts) + base for counts, base in zip(data['counts'], data['base'])], [1, 2])
+
+    def test_bad_range(self):
+        """A malformed bound is a bad request."""
+        self.assertEqual(self.client.get(self.url(since="soon")).status_code, 400)
@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 import datetime
 from django.utils import timezone
 from polls.models import Question
@@ -21,6 +22,10 @@ def create_question(question_text, days, end=1):
 class QuestionIndexViewTests(TestCase):
     """Test index view."""
 
+    def setUp(self):
+        # cached pages outlive the rolled back questions of other tests
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
@@ -65,3 +70,34 @@ class QuestionIndexViewTests(TestCase):
             [question1, question2],
         )
         print(response)
+
+
+@override_settings(POLLS_INDEX_PAGE_SIZE=2)
+class QuestionIndexPaginationTests(TestCase):
+    """Test keyset pagination and filtering of the index."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_next_page(self):
+        """The index shows one page of polls and a cursor to the next one."""
+        questions = [create_question(question_text=f"Question {n}.", days=n - 10) for n in range(3)]
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(response.context['latest_question_list'], questions[:2])
+        cursor = response.context['next_cursor']
+        response = self.client.get(reverse('polls:index'), {'after': cursor})
+        self.assertEqual(response.context['latest_question_list'], questions[2:])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_bad_cursor_shows_first_page(self):
+        """A cursor that cannot be decoded falls back to the first page."""
+        question = create_question(question_text="Past question.", days=-30)
+        response = self.client.get(reverse('polls:index'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.context['latest_question_list'], [question])
+
+    def test_open_polls_only(self):
+        """The open filter leaves out polls whose voting period is over."""
+        create_question(question_text="Closed question.", days=-30)
+        question = create_question(question_text="Open question.", days=-1, end=5)
+        response = self.client.get(reverse('polls:index'), {'open': '1'})
+        self.assertEqual(response.context['latest_question_list'], [question])
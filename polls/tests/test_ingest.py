@@ -0,0 +1,92 @@
+"""Test batched vote ingestion."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+import datetime
+from django.utils import timezone
+from polls import ingest
+from polls.models import Question, Vote
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+@override_settings(POLLS_VOTE_INGEST=True, POLLS_VOTE_BATCH_SIZE=3, POLLS_VOTE_FLUSH_INTERVAL=0)
+class VoteQueueTests(TestCase):
+    """Test the vote queue and its bulk writes."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f"voter{n}", password="voter-pass-123") for n in range(3)]
+        self.question = create_question("Queued question", days=-1, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+
+    def test_flush_writes_new_and_changed_votes(self):
+        """A flush creates new votes, moves changed ones and updates the counters."""
+        Vote.objects.create(user=self.users[0], question=self.question, choice=self.choice1)
+        self.choice1.vote_count = 1
+        self.choice1.save()
+        queue = ingest.get_queue()
+        queue.submit(self.users[0].id, self.question.id, self.choice2.id)
+        queue.submit(self.users[1].id, self.question.id, self.choice1.id)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(len(queue), 0)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (1, 1))
+        self.assertEqual(Vote.objects.get(user=self.users[0]).choice, self.choice2)
+
+    def test_full_batch_flushes(self):
+        """Reaching POLLS_VOTE_BATCH_SIZE queued votes writes them at once."""
+        queue = ingest.get_queue()
+        for user in self.users:
+            queue.submit(user.id, self.question.id, self.choice1.id)
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(len(queue), 0)
+
+    def test_voter_reads_own_queued_vote(self):
+        """The voter sees their queued vote in the results before it is flushed."""
+        self.client.force_login(self.users[0])
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice2.id})
+        self.assertFalse(Vote.objects.exists())
+        response = self.client.get(reverse('polls:resultData', args=(self.question.id,)))
+        self.assertEqual(response.json(), [{"one": 0}, {"two": 1}])
+        ingest.get_queue().flush()
+        response = self.client.get(reverse('polls:resultData', args=(self.question.id,)))
+        self.assertEqual(response.json(), [{"one": 0}, {"two": 1}])
+
+
+@override_settings(POLLS_VOTE_INGEST=True, POLLS_VOTE_BATCH_SIZE=3, POLLS_VOTE_FLUSH_INTERVAL=0)
+class VoteQueueFailureTests(TransactionTestCase):
+    """Test flushing a batch holding a vote that cannot be written."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalid_vote_dropped(self):
+        """A vote for a choice deleted while queued is dropped, the others are written."""
+        users = [User.objects.create_user(username=f"voter{n}") for n in range(2)]
+        question = create_question("Queued question", days=-1, end=5)
+        choice = question.choice_set.create(choice_text="one")
+        deleted = question.choice_set.create(choice_text="two")
+        queue = ingest.get_queue()
+        queue.submit(users[0].id, question.id, choice.id)
+        queue.submit(users[1].id, question.id, deleted.id)
+        deleted.delete()
+        with self.assertLogs('polls', 'WARNING'):
+            self.assertEqual(queue.flush(), 1)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(list(Vote.objects.values_list('user_id', 'choice_id')), [(users[0].id, choice.id)])
@@ -0,0 +1,42 @@
+"""Test the request metrics middleware."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from polls import metrics
+from django.urls import reverse
+
+
+class RequestMetricsTests(TestCase):
+    """Test request metrics recording, logging and reporting."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def test_request_recorded(self):
+        """A request is logged and counted under its URL name."""
+        with self.assertLogs('polls', level='INFO') as logs:
+            self.client.get(reverse('polls:index'))
+        self.assertIn('"view": "polls:index"', logs.output[0])
+        view = metrics.registry.snapshot()['views']['polls:index']
+        self.assertEqual(view['requests'], 1)
+        self.assertEqual(view['queries'], 1)
+        self.assertGreater(view['render_ms'], 0)
+        self.assertEqual(sum(view['total_ms_histogram']), 1)
+
+    @override_settings(POLLS_QUERY_BUDGET=0)
+    def test_query_budget_warning(self):
+        """A view running more queries than its budget logs a warning."""
+        with self.assertLogs('polls', level='WARNING') as logs:
+            self.client.get(reverse('polls:index'))
+        self.assertIn("polls:index ran 1 queries, over its budget of 0", logs.output[0])
+
+    def test_metrics_staff_only(self):
+        """Only staff can read the aggregated metrics."""
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username="staff", password="staff-pass-123", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertIn('polls:metrics', response.json()['views'])
@@ -0,0 +1,92 @@
+"""Test cached pages and conditional GETs of ku-polls."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+import datetime
+from django.utils import timezone
+from polls.models import Question
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Question", days=-1, end=5)
+        self.choice = self.question.choice_set.create(choice_text="choice")
+
+    def test_result_data_not_modified(self):
+        """resultData answers 304 without queries until a vote changes the tallies."""
+        url = reverse('polls:resultData', args=(self.question.id,))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.login(username="voter", password="voter-pass-123")
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_not_modified(self):
+        """The voting form answers 304 until its choices change."""
+        url = reverse('polls:detail', args=(self.question.id,))
+        # the first response sets the CSRF cookie the form depends on
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIn('Cookie', response['Vary'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        self.question.choice_set.create(choice_text="new choice")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "new choice")
+
+    def test_detail_modified_by_login(self):
+        """A login rotates the CSRF secret, so the voting form is sent again with the new token."""
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.post(reverse('login'), {'username': "voter", 'password': "voter-pass-123"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Test whole page caching for anonymous users."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_cached_until_questions_change(self):
+        """The index is served from the cache until a question is saved."""
+        create_question("First question", days=-1)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('polls:index'))
+        create_question("Second question", days=-1)
+        self.assertContains(self.client.get(reverse('polls:index')), "Second question")
+
+    def test_logged_in_index_not_cached(self):
+        """A logged in user never gets the page cached for anonymous users."""
+        create_question("First question", days=-1)
+        self.client.get(reverse('polls:index'))
+        User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.login(username="voter", password="voter-pass-123")
+        self.assertContains(self.client.get(reverse('polls:index')), "Hello, voter")
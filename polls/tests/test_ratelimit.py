@@ -0,0 +1,98 @@
+"""Test vote rate limiting and duplicate suppression."""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+import datetime
+from django.utils import timezone
+from polls import ratelimit
+from polls.models import Question
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class VoteScreeningTests(TestCase):
+    """Test the screening of votes before they reach the database."""
+
+    def setUp(self):
+        cache.clear()
+        ratelimit.rejections.clear()
+        self.user = User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.force_login(self.user)
+        self.question = create_question("Limited question", days=-1, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def test_repeated_vote_short_circuited(self):
+        """The same vote again reads no poll table."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('polls', level='INFO'):
+            response = self.client.post(self.url, {'choice': self.choice1.id})
+        self.assertFalse([query for query in queries if 'polls_' in query['sql']])
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        self.assertEqual(ratelimit.rejections['repeat'], 1)
+
+    def test_changed_vote_goes_through(self):
+        """A different choice is not taken for a repeat."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        self.client.post(self.url, {'choice': self.choice2.id})
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice2.votes, 1)
+
+    @override_settings(POLLS_VOTE_BURST=2, POLLS_VOTE_RATE=0.01)
+    def test_user_rate_limited(self):
+        """Votes beyond the user's burst are refused with a 429 and logged."""
+        choices = [self.choice1, self.choice2, self.choice1]
+        responses = [self.client.post(self.url, {'choice': choice.id}) for choice in choices[:2]]
+        self.assertEqual([r.status_code for r in responses], [302, 302])
+        with self.assertLogs('polls', level='WARNING') as logs:
+            response = self.client.post(self.url, {'choice': choices[2].id})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertIn("refused: rate (1 so far)", logs.output[0])
+
+    @override_settings(POLLS_VOTE_IP_RATE_LIMITER='polls.ratelimit.CacheTokenBucket',
+                       POLLS_VOTE_IP_BURST=1, POLLS_VOTE_IP_RATE=0.01)
+    def test_ip_rate_limited(self):
+        """With the IP limiter on, users voting from one address share its bucket."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        other = User.objects.create_user(username="other")
+        self.client.force_login(other)
+        with self.assertLogs('polls', level='WARNING'):
+            response = self.client.post(self.url, {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(POLLS_VOTE_IP_BURST=1, POLLS_VOTE_IP_RATE=0.01)
+    def test_shared_ip_not_limited_by_default(self):
+        """Users behind one address are not limited by it unless the IP limiter is configured."""
+        self.client.post(self.url, {'choice': self.choice1.id})
+        self.client.force_login(User.objects.create_user(username="other"))
+        self.assertEqual(self.client.post(self.url, {'choice': self.choice1.id}).status_code, 302)
+
+    @override_settings(POLLS_VOTE_BURST=1, POLLS_VOTE_RATE=0.01)
+    def test_get_spends_no_token(self):
+        """Only a submitted vote takes a token from the user's bucket."""
+        self.client.get(self.url)
+        self.assertEqual(self.client.post(self.url, {'choice': self.choice1.id}).status_code, 302)
+
+    @override_settings(POLLS_VOTE_RATE_LIMITER='polls.ratelimit.NoRateLimit', POLLS_VOTE_BURST=0)
+    def test_pluggable_limiter(self):
+        """POLLS_VOTE_RATE_LIMITER swaps the limiter."""
+        response = self.client.post(self.url, {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,198 @@
+"""Test results page and result data of ku-polls."""
+
+import gzip
+import json
+import struct
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+import datetime
+from django.utils import timezone
+from io import StringIO
+from django.core.management import call_command
+from polls.models import Question, ResultSnapshot
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1, choices=0):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    `choices` choices are added, the n-th one having n votes.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    question = Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+    for n in range(choices):
+        question.choice_set.create(choice_text=f"choice {n}", vote_count=n)
+    return question
+
+
+class ResultDataTests(TestCase):
+    """Test the JSON result data of a question."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_result_data(self):
+        """resultData returns one {choice_text: votes} item per choice."""
+        question = create_question("Question", days=-1, choices=3)
+        response = self.client.get(reverse('polls:resultData', args=(question.id,)))
+        self.assertEqual(response.json(), [{"choice 0": 0}, {"choice 1": 1}, {"choice 2": 2}])
+
+    def test_result_data_missing_question(self):
+        """resultData of a question that does not exist is a 404."""
+        response = self.client.get(reverse('polls:resultData', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/polls/resultdata/abc/').status_code, 404)
+
+    def test_result_data_query_count(self):
+        """resultData of an open poll loads the question and its tallies, and nothing once cached."""
+        few = create_question("Few choices", days=-1, end=5, choices=2)
+        many = create_question("Many choices", days=-1, end=5, choices=20)
+        for question in (few, many):
+            with self.assertNumQueries(2):
+                self.client.get(reverse('polls:resultData', args=(question.id,)))
+            with self.assertNumQueries(0):
+                self.client.get(reverse('polls:resultData', args=(question.id,)))
+
+    def test_vote_refreshes_cached_results(self):
+        """A vote replaces the cached tallies instead of leaving them stale."""
+        User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.login(username="voter", password="voter-pass-123")
+        question = create_question("Question", days=-1, end=5, choices=2)
+        choice = question.choice_set.get(choice_text="choice 0")
+        url = reverse('polls:resultData', args=(question.id,))
+        padded_url = f'/polls/resultdata/0{question.id}/'
+        self.assertEqual(self.client.get(url).json()[0], {"choice 0": 0})
+        self.assertEqual(self.client.get(padded_url).json()[0], {"choice 0": 0})
+        self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()[0], {"choice 0": 1})
+        self.assertEqual(self.client.get(padded_url).json()[0], {"choice 0": 1})
+
+
+class ResultsViewTests(TestCase):
+    """Test the results page."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_page_shows_votes(self):
+        """The results page lists every choice."""
+        question = create_question("Question", days=-1, choices=2)
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertContains(response, "choice 1")
+
+    def test_results_page_query_count(self):
+        """The results page query count does not grow with the number of choices, and is 0 once cached."""
+        few = create_question("Few choices", days=-1, end=5, choices=2)
+        many = create_question("Many choices", days=-1, end=5, choices=20)
+        for question in (few, many):
+            with self.assertNumQueries(2):
+                self.client.get(reverse('polls:results', args=(question.id,)))
+            with self.assertNumQueries(0):
+                self.client.get(reverse('polls:results', args=(question.id,)))
+
+
+class ResultSnapshotTests(TestCase):
+    """Test the frozen results of closed polls."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Closed question", days=-5, end=2, choices=3)
+
+    def test_command_snapshots_closed_polls(self):
+        """snapshot_results freezes tallies, percentages and turnout of closed polls only."""
+        create_question("Open question", days=-1, end=5, choices=2)
+        call_command('snapshot_results', stdout=StringIO())
+        snapshot = ResultSnapshot.objects.get()
+        self.assertEqual(snapshot.pk, self.question.pk)
+        self.assertEqual(snapshot.turnout, 3)
+        self.assertEqual([c['percent'] for c in snapshot.data['choices']], [0.0, 33.3, 66.7])
+
+    def test_closed_poll_read_from_snapshot(self):
+        """Once snapshotted, closed results cost one primary key lookup."""
+        call_command('snapshot_results', stdout=StringIO())
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, "Final results, 3 votes.")
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:resultData', args=(self.question.id,)))
+        self.assertEqual(response.json(), [{"choice 0": 0}, {"choice 1": 1}, {"choice 2": 2}])
+
+    def test_first_read_writes_snapshot(self):
+        """A closed poll without a snapshot gets one on its first read."""
+        self.client.get(reverse('polls:resultData', args=(self.question.id,)))
+        self.assertTrue(ResultSnapshot.objects.filter(pk=self.question.pk).exists())
+
+    def test_snapshot_expires_open_page(self):
+        """Snapshotting a poll that just closed changes the ETag of its results page."""
+        question = create_question("Closing question", days=-1, end=5, choices=2)
+        url = reverse('polls:results', args=(question.id,))
+        etag = self.client.get(url)['ETag']
+        Question.objects.filter(pk=question.pk).update(end_date=timezone.now())
+        call_command('snapshot_results', stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Final results")
+
+    def test_reopened_poll_drops_snapshot(self):
+        """Moving end_date to the future discards the snapshot and counts live again."""
+        call_command('snapshot_results', stdout=StringIO())
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        self.assertFalse(ResultSnapshot.objects.exists())
+        self.question.choice_set.create(choice_text="late choice", vote_count=4)
+        response = self.client.get(reverse('polls:resultData', args=(self.question.id,)))
+        self.assertEqual(response.json()[-1], {"late choice": 4})
+
+
+class ResultFormatTests(TestCase):
+    """Test the negotiated formats of resultData and the bulk export."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question("Question", days=-1, end=5, choices=3)
+        self.url = reverse('polls:resultData', args=(self.question.id,))
+
+    def test_columnar_format(self):
+        """?format=columnar returns parallel labels and counts."""
+        data = self.client.get(self.url, {'format': 'columnar'}).json()
+        self.assertEqual(data['labels'], ["choice 0", "choice 1", "choice 2"])
+        self.assertEqual(data['counts'], [0, 1, 2])
+
+    def test_binary_format_by_accept(self):
+        """Accept: application/octet-stream returns the counts packed as uint32."""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(struct.unpack('<3I', response.content), (0, 1, 2))
+        self.assertIn('Accept', response['Vary'])
+
+    def test_formats_have_distinct_etags(self):
+        """A cached representation of one format never validates another."""
+        json_etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, {'format': 'binary'}, HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_gzip(self):
+        """Large results are gzip compressed for clients accepting it."""
+        question = create_question("Many choices", days=-1, end=5, choices=50)
+        response = self.client.get(reverse('polls:resultData', args=(question.id,)),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+    def test_streamed_export(self):
+        """The bulk export streams one columnar line per question."""
+        create_question("Second", days=-1, end=5, choices=2)
+        create_question("Unpublished", days=2, end=5, choices=2)
+        response = self.client.get(reverse('polls:exportResults'))
+        self.assertTrue(response.streaming)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([line['question_text'] for line in lines], ["Question", "Second"])
+        self.assertEqual(lines[0]['counts'], [0, 1, 2])
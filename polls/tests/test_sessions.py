@@ -0,0 +1,52 @@
+"""Test cached sessions and the cached user backend."""
+
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class CachedSessionTests(TestCase):
+    """Test logging in and out with cache sessions and cached users."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="voter", password="voter-pass-123")
+
+    def login(self):
+        return self.client.post(reverse('login'), {'username': "voter", 'password': "voter-pass-123"})
+
+    def test_login_logout_signals(self):
+        """The login and logout receivers still log with cached sessions."""
+        with self.assertLogs('polls', level='INFO') as logs:
+            self.login()
+            self.client.post(reverse('logout'))
+        output = "\n".join(logs.output)
+        self.assertIn("voter logged in from 127.0.0.1", output)
+        self.assertIn("logout user: voter via ip: 127.0.0.1", output)
+
+    def test_authenticated_request_reads_no_session_or_user(self):
+        """Once cached, a logged in page view does not query the session or the user."""
+        self.login()
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Hello, voter")
+
+    def test_password_change_logs_out(self):
+        """Saving the user drops the cached copy, so a password change ends the session."""
+        self.login()
+        self.client.get(reverse('polls:index'))
+        self.user.set_password("new-pass-456")
+        self.user.save()
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotContains(response, "Hello, voter")
+
+    def test_failed_login_checks_password_once(self):
+        """A wrong password is hashed by one backend only."""
+        with mock.patch.object(User, 'check_password', return_value=False) as check_password, \
+                self.assertLogs('polls', level='WARNING'):
+            self.client.post(reverse('login'), {'username': "voter", 'password': "wrong"})
+        self.assertEqual(check_password.call_count, 1)
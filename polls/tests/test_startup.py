@@ -0,0 +1,59 @@
+"""Test the API-only profile and the cold start benchmark of ku-polls."""
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import datetime
+from django.utils import timezone
+from polls.benchmarks.coldstart import cold_start, parse_importtime
+from polls.models import Question
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+@override_settings(ROOT_URLCONF='mysite.urls_api')
+class ApiUrlconfTests(TestCase):
+    """Test the urls of API-only nodes."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_polls_served(self):
+        """The polls endpoints answer as on the full site."""
+        question = create_question("Question", days=-1, end=5)
+        question.choice_set.create(choice_text="choice")
+        response = self.client.get(reverse('polls:resultData', args=(question.id,)))
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_admin(self):
+        """The admin and account pages are not served."""
+        self.assertEqual(self.client.get('/admin/').status_code, 404)
+        self.assertEqual(self.client.get('/accounts/login/').status_code, 404)
+
+
+class ImportTimeTests(TestCase):
+    """Test reading -X importtime output."""
+
+    def test_parse_importtime(self):
+        """Self times are summed by package, in milliseconds."""
+        text = ("import time: self [us] | cumulative | imported package\n"
+                "import time:      1500 |       1500 |     django.db.models.fields\n"
+                "import time:       500 |       2000 |   django.db.models\n"
+                "import time:       250 |        250 | polls\n")
+        self.assertEqual(parse_importtime(text), {'django.db': 2.0, 'polls': 0.25})
+
+    def test_cold_start_needs_success(self):
+        """A cold start answering anything but 200 is a failed run, not a timing."""
+        with self.assertRaisesRegex(RuntimeError, "404"):
+            cold_start('mysite.settings_api', '/no-such-page/')
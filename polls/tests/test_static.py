@@ -0,0 +1,98 @@
+"""Test the static bundles of ku-polls."""
+
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import datetime
+from django.utils import timezone
+from polls.models import Question
+from polls.staticfiles import BundledManifestStorage, minify_css, minify_js
+from django.urls import reverse
+
+STATIC_DIR = os.path.join(settings.BASE_DIR, 'polls', 'static')
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class MinifyTests(TestCase):
+    """Test the minifiers of the bundles."""
+
+    def test_minify_css(self):
+        """Comments and spaces go, the rules stay."""
+        css = "/* page */\n.main h1 {\n  color: green;\n  margin: 0 5px;\n}\na, b > i { top: 0 }\n"
+        self.assertEqual(minify_css(css), ".main h1{color:green;margin:0 5px}a,b>i{top:0}")
+
+    def test_minify_js(self):
+        """Comment lines, indentation and blank lines go, line breaks stay."""
+        js = "// chart\nvar a = 1\n\n  if (a) {\n    go('http://x')  // now\n  }\n"
+        self.assertEqual(minify_js(js), "var a = 1\nif (a) {\ngo('http://x')  // now\n}")
+
+
+class BundledStorageTests(TestCase):
+    """Test building the bundles during collectstatic."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = os.path.join(directory.name, 'static')
+        shutil.copytree(STATIC_DIR, self.root)
+        self.storage = BundledManifestStorage(location=self.root)
+
+    def collect(self):
+        paths = {}
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                name = os.path.relpath(os.path.join(directory, file), self.root).replace(os.sep, '/')
+                paths[name] = (self.storage, name)
+        list(self.storage.post_process(paths))
+        return BundledManifestStorage(location=self.root)
+
+    def test_bundles_hashed(self):
+        """Every bundle is written minified under a content-hashed name."""
+        storage = self.collect()
+        for name in settings.POLLS_STATIC_BUNDLES:
+            self.assertNotEqual(storage.stored_name(name), name)
+            self.assertTrue(storage.exists(storage.stored_name(name)))
+        with storage.open(storage.stored_name('polls/index.css')) as file:
+            css = file.read().decode()
+        self.assertNotIn('\n  ', css)
+        self.assertIn(storage.stored_name('polls/images/background.gif').split('/')[-1], css)
+        with storage.open(storage.stored_name('polls/results.js')) as file:
+            self.assertTrue(file.read().startswith(b'/*! jQuery'))
+
+
+class BundleTagTests(TestCase):
+    """Test linking the bundles from the pages."""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DEBUG=True, STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_sources_linked_in_development(self):
+        """Without the bundling storage a page links the source files of its bundles."""
+        question = create_question("Question", days=-1, end=5)
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertContains(response, '<script src="/static/polls/vendor/jquery.min.js"></script>', html=True)
+        self.assertContains(response, '<script src="/static/polls/js/results.js"></script>', html=True)
+        self.assertContains(response, f'data-question-id="{question.id}"')
+
+    @override_settings(DEBUG=False, STATICFILES_STORAGE='polls.staticfiles.BundledManifestStorage')
+    def test_sources_linked_before_collectstatic(self):
+        """The bundling storage links the plain source files until collectstatic built the bundles."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, '<link rel="stylesheet" type="text/css" href="/static/polls/style.css">',
+                            html=True)
@@ -0,0 +1,98 @@
+"""Test live results streams of ku-polls."""
+
+import asyncio
+import json
+import threading
+from django.core.cache import cache
+from django.test import TestCase
+import datetime
+from django.utils import timezone
+from polls.models import Question
+from polls.streams import Broadcaster, broadcaster
+from django.urls import reverse
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class BroadcasterTests(TestCase):
+    """Test the in-process fan-out of count changes."""
+
+    async def test_publish_from_another_thread(self):
+        """Every subscriber of a question gets deltas published by a sync thread."""
+        hub = Broadcaster()
+        first, second = hub.subscribe(1), hub.subscribe(1)
+        other = hub.subscribe(2)
+        thread = threading.Thread(target=hub.publish, args=(1, {10: 1, 11: -1}))
+        thread.start()
+        thread.join()
+        self.assertEqual(await asyncio.wait_for(first.get(), 1), {10: 1, 11: -1})
+        self.assertEqual(await asyncio.wait_for(second.get(), 1), {10: 1, 11: -1})
+        self.assertTrue(other.empty())
+
+    async def test_unsubscribe(self):
+        """A stream that unsubscribed is no longer counted."""
+        hub = Broadcaster()
+        queue = hub.subscribe(1)
+        hub.unsubscribe(1, queue)
+        self.assertEqual(hub.subscriber_count(1), 0)
+
+
+class ResultStreamTests(TestCase):
+    """Test the server-sent events endpoint."""
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_snapshot_then_delta(self):
+        """The stream starts with the tallies and then relays published deltas."""
+        question = await Question.objects.acreate(
+            question_text="Question", pub_date=timezone.now(), end_date=timezone.now() + datetime.timedelta(days=1))
+        choice = await question.choice_set.acreate(choice_text="choice", vote_count=2)
+        response = await self.async_client.get(reverse('polls:resultStream', args=(question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        snapshot = await anext(events)
+        self.assertIn(b'event: snapshot', snapshot)
+        data = json.loads(snapshot.decode().split('data: ')[1])
+        self.assertEqual(data, {'ids': [choice.id], 'labels': ['choice'], 'counts': [2]})
+        broadcaster.publish(question.id, {choice.id: 1})
+        delta = await asyncio.wait_for(anext(events), 1)
+        self.assertIn(f'data: {{"{choice.id}": 1}}'.encode(), delta)
+        await events.aclose()
+
+    async def test_missing_question(self):
+        """Streaming a question that does not exist is a 404."""
+        response = await self.async_client.get(reverse('polls:resultStream', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_snapshot_only(self):
+        """Under WSGI the stream sends the snapshot and ends, the browser reconnects later."""
+        question = create_question("Question", days=-1, end=5)
+        choice = question.choice_set.create(choice_text="choice", vote_count=2)
+        response = self.client.get(reverse('polls:resultStream', args=(question.id,)))
+        self.assertFalse(response.streaming)
+        self.assertIn(b'retry: ', response.content)
+        self.assertIn(f'"ids": [{choice.id}]'.encode(), response.content)
+
+    def test_results_page_streams_under_asgi_only(self):
+        """Only a results page served under ASGI follows the stream."""
+        question = create_question("Question", days=-1, end=5)
+        self.assertNotContains(self.client.get(reverse('polls:results', args=(question.id,))), 'data-live-stream')
+
+    async def test_results_page_streams_under_asgi(self):
+        """A results page served under ASGI follows the stream."""
+        question = await Question.objects.acreate(
+            question_text="Question", pub_date=timezone.now(), end_date=timezone.now() + datetime.timedelta(days=1))
+        response = await self.async_client.get(reverse('polls:results', args=(question.id,)))
+        self.assertContains(response, 'data-live-stream')
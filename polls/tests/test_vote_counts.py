@@ -0,0 +1,179 @@
+"""Test the denormalized vote counters."""
+
+from io import StringIO
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from polls import counters, services
+from polls.models import Choice, ChoiceCounterShard, Question, Vote
+
+
+def create_question(question_text, days, end=1):
+    """
+    Create question mockup.
+
+    Create a question with the given `question_text` and published the
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_time = time + datetime.timedelta(days=end)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_time)
+
+
+class VoteCounterTests(TestCase):
+    """Test that voting keeps Choice.vote_count in step with the votes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="voter", password="voter-pass-123")
+        self.client.login(username="voter", password="voter-pass-123")
+        self.question = create_question("Counted question", days=-1, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+
+    def vote(self, choice):
+        return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def test_new_vote_increments_counter(self):
+        """A first vote adds one to the chosen choice."""
+        self.vote(self.choice1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Changing a vote takes it from the old choice and gives it to the new one."""
+        self.vote(self.choice1)
+        self.vote(self.choice2)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (0, 1))
+
+    def test_same_vote_twice_counts_once(self):
+        """Submitting the same choice again does not change the counters."""
+        self.vote(self.choice1)
+        self.vote(self.choice1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_deleted_user_takes_votes_off(self):
+        """Votes deleted with their user come off the counters and the cached results."""
+        others = [User.objects.create_user(username=f"other{n}") for n in range(2)]
+        for user in others:
+            services.cast_vote(user, self.question, self.choice1)
+        self.vote(self.choice1)
+        url = reverse('polls:resultData', args=(self.question.id,))
+        self.assertEqual(self.client.get(url).json(), [{"one": 3}, {"two": 0}])
+        with self.captureOnCommitCallbacks(execute=True):
+            others[0].delete()
+        self.assertEqual(Choice.objects.get(pk=self.choice1.pk).votes, 2)
+        self.assertEqual(self.client.get(url).json(), [{"one": 2}, {"two": 0}])
+
+    def test_rebuild_command_fixes_drift(self):
+        """rebuild_vote_counts recounts votes created behind the counters' back, and expires cached results."""
+        url = reverse('polls:resultData', args=(self.question.id,))
+        self.client.get(url)
+        Vote.objects.create(user=self.user, question=self.question, choice=self.choice2)
+        out = StringIO()
+        call_command('rebuild_vote_counts', '--dry-run', stdout=out)
+        self.assertEqual(Choice.objects.get(pk=self.choice2.pk).votes, 0)
+        call_command('rebuild_vote_counts', stdout=out)
+        self.assertEqual(Choice.objects.get(pk=self.choice2.pk).votes, 1)
+        self.assertIn("fixed 1 drifted counter(s)", out.getvalue())
+        self.assertEqual(self.client.get(url).json(), [{"one": 0}, {"two": 1}])
+
+
+class VoteUpsertTests(TestCase):
+    """Test that a user keeps a single vote per question."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="voter", password="voter-pass-123")
+        self.question = create_question("Upsert question", days=-1, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+
+    def test_cast_vote_replaces_previous_vote(self):
+        """cast_vote updates the existing vote and reports the replaced choice."""
+        _, old = services.cast_vote(self.user, self.question, self.choice1)
+        self.assertIsNone(old)
+        vote, old = services.cast_vote(self.user, self.question, self.choice2)
+        self.assertEqual(old, self.choice1.id)
+        self.assertEqual(Vote.objects.get(user=self.user, question=self.question).choice, self.choice2)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_unique_vote_per_question(self):
+        """The database refuses a second vote row for the same user and question."""
+        Vote.objects.create(user=self.user, question=self.question, choice=self.choice1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, question=self.question, choice=self.choice2)
+
+
+@override_settings(POLLS_COUNTER_SHARDS=4)
+class ShardedCounterTests(TestCase):
+    """Test vote counters spread over shard rows."""
+
+    def setUp(self):
+        self.question = create_question("Sharded question", days=-2, end=5)
+        self.choice1 = self.question.choice_set.create(choice_text="one")
+        self.choice2 = self.question.choice_set.create(choice_text="two")
+        self.users = [User.objects.create_user(username=f"voter{n}") for n in range(8)]
+
+    def test_votes_go_to_shards(self):
+        """Votes land in shard rows, not on the choice, and reads sum them."""
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.vote_count, 0)
+        self.assertEqual(self.choice1.votes, 8)
+        self.assertLessEqual(self.choice1.counter_shards.count(), 4)
+        self.assertEqual([r.votes for r in services.get_results(self.question.id)], [8, 0])
+
+    def test_annotated_votes_skip_query(self):
+        """Annotated or prefetched choices read their votes without a query."""
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice1)
+        annotated = Choice.objects.annotate(total=F('vote_count') + counters.shard_total()).get(pk=self.choice1.pk)
+        prefetched = Choice.objects.prefetch_related('counter_shards').get(pk=self.choice1.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual((annotated.votes, prefetched.votes), (8, 8))
+
+    def test_delete_question_with_shards(self):
+        """A question deletes with its votes and shards, writing no shard for a deleted choice."""
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice1)
+        self.question.delete()
+        self.assertFalse(ChoiceCounterShard.objects.exists())
+
+    def test_same_user_same_shard(self):
+        """A user's changed vote moves through the same shard of each choice."""
+        services.cast_vote(self.users[0], self.question, self.choice1)
+        services.cast_vote(self.users[0], self.question, self.choice2)
+        shard = counters.pick_shard(self.users[0].pk)
+        self.assertEqual(ChoiceCounterShard.objects.get(choice=self.choice1, shard=shard).count, 0)
+        self.assertEqual(ChoiceCounterShard.objects.get(choice=self.choice2, shard=shard).count, 1)
+
+    def test_rebuild_counts_shards(self):
+        """Counters kept in shards are not reported as drifted."""
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice2)
+        self.assertEqual(counters.rebuild(), [])
+
+    def test_compact_command_folds_ended_polls(self):
+        """compact_vote_counters folds the shards of ended polls only."""
+        open_question = create_question("Open question", days=-1, end=5)
+        open_choice = open_question.choice_set.create(choice_text="open")
+        for user in self.users:
+            services.cast_vote(user, self.question, self.choice1)
+            services.cast_vote(user, open_question, open_choice)
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now())
+        call_command('compact_vote_counters', stdout=StringIO())
+        self.choice1.refresh_from_db()
+        self.assertEqual((self.choice1.vote_count, self.choice1.counter_shards.count()), (8, 0))
+        self.assertTrue(open_choice.counter_shards.exists())
+        self.assertEqual(open_choice.votes, 8)
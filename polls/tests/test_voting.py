@@ -36,3 +36,33 @@ class QuestionModelTests(TestCase):
         """can_vote() must return False when a poll is not publishing anymore."""
         future_question = create_question("passed_question", -5)
         self.assertIs(future_question.can_vote(), False)
+
+
+class QuestionQuerySetTests(TestCase):
+    """Test the SQL forms of is_published and can_vote."""
+
+    def setUp(self):
+        self.open_question = create_question("open_question", -1, 3)
+        self.future_question = create_question("future_question", 3)
+        self.passed_question = create_question("passed_question", -5)
+
+    def test_published(self):
+        """published() leaves out questions that are not published yet."""
+        self.assertQuerysetEqual(
+            Question.objects.published().order_by('pub_date'),
+            [self.passed_question, self.open_question],
+        )
+
+    def test_open_for_voting(self):
+        """open_for_voting() only keeps questions that can_vote()."""
+        self.assertQuerysetEqual(Question.objects.open_for_voting(), [self.open_question])
+
+    def test_recent(self):
+        """recent() only keeps questions published within the last day."""
+        recent_question = create_question("recent_question", 0, 3)
+        self.assertQuerysetEqual(Question.objects.recent(), [recent_question])
+
+    def test_with_is_open(self):
+        """with_is_open() agrees with can_vote() on every question."""
+        for question in Question.objects.with_is_open():
+            self.assertIs(question.is_open, question.can_vote())
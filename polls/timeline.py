@@ -0,0 +1,52 @@
+"""Vote timelines of questions, read from the pre-aggregated vote buckets.
+
+A timeline covers a time range in evenly spaced slots. For every choice it
+holds the net change of its votes in each slot, plus its votes from before
+the range, so a chart adds them up into running totals. Ranges of more
+than max_points minutes are read from the hour buckets, and slots are
+merged further when that still gives too many points.
+"""
+import math
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .events import bucket_start
+from .models import Choice, VoteBucket
+
+
+def get_timeline(question, since=None, until=None, max_points=240):
+    """Return the vote timeline of question between since and until as compact arrays.
+
+    The range defaults to the voting period of the question up to now.
+    Slot i of counts starts at start + i * step (epoch seconds).
+    """
+    since = since or question.pub_date
+    until = min(until or timezone.now(), question.end_date)
+    until = max(until, since)
+    span_minutes = (until - since).total_seconds() / 60
+    resolution = VoteBucket.MINUTE if span_minutes <= max_points else VoteBucket.HOUR
+    first = bucket_start(since, resolution)
+    buckets_in_range = int((until - first).total_seconds() // resolution) + 1
+    merge = math.ceil(buckets_in_range / max_points)
+    step = resolution * merge
+    choices = list(Choice.objects.filter(question=question).order_by('id').values_list('id', 'choice_text'))
+    index = {choice_id: n for n, (choice_id, _) in enumerate(choices)}
+    counts = [[0] * math.ceil(buckets_in_range / merge) for _ in choices]
+    buckets = VoteBucket.objects.filter(question_id=question.id, resolution=resolution)
+    for choice_id, start, count in buckets.filter(start__gte=first, start__lte=until).values_list(
+            'choice_id', 'start', 'count'):
+        if choice_id in index:
+            counts[index[choice_id]][int((start - first).total_seconds() // step)] += count
+    base = [0] * len(choices)
+    for row in buckets.filter(start__lt=first).values('choice_id').annotate(total=Sum('count')):
+        if row['choice_id'] in index:
+            base[index[row['choice_id']]] = row['total']
+    return {
+        'start': int(first.timestamp()),
+        'step': step,
+        'ids': [choice_id for choice_id, _ in choices],
+        'labels': [choice_text for _, choice_text in choices],
+        'base': base,
+        'counts': counts,
+    }
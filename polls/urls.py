@@ -1,13 +1,44 @@
 """Handle path of any pages."""
-from django.urls import path
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import clear_url_caches, path
 from . import views
 
 app_name = 'polls'
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('<int:question_id>/', views.detail, name='detail'),
-    path('<int:question_id>/results/', views.results, name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'),
-    # this path was create to make zingChart
-    path('resultdata/<str:obj>/', views.resultData, name='resultData'),
-]
+
+
+def build_urlpatterns(page_views):
+    """Return the polls url patterns serving the pages from page_views (views or async_views)."""
+    return [
+        path('', page_views.index, name='index'),
+        path('<int:question_id>/', page_views.detail, name='detail'),
+        path('<int:question_id>/results/', page_views.results, name='results'),
+        path('<int:question_id>/vote/', page_views.vote, name='vote'),
+        path('<int:question_id>/stream/', views.resultStream, name='resultStream'),
+        # this path was create to make zingChart
+        path('resultdata/<int:obj>/', page_views.resultData, name='resultData'),
+        path('timelinedata/<int:question_id>/', views.timelineData, name='timelineData'),
+        path('export/results/', views.exportResults, name='exportResults'),
+        path('export/votes/', views.exportVotes, name='exportVotes'),
+        path('metrics/', views.metricsData, name='metrics'),
+    ]
+
+
+def page_views(use_async):
+    """Return the module of the page views, importing the async views only when they are served."""
+    if use_async:
+        from . import async_views
+        return async_views
+    return views
+
+
+urlpatterns = build_urlpatterns(page_views(settings.POLLS_ASYNC_VIEWS))
+
+
+@receiver(setting_changed)
+def switch_views(setting, value, **kwargs):
+    """Serve the other set of views when POLLS_ASYNC_VIEWS changes (in tests)."""
+    if setting == 'POLLS_ASYNC_VIEWS':
+        urlpatterns[:] = build_urlpatterns(page_views(value))
+        clear_url_caches()
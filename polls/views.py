@@ -1,67 +1,190 @@
 """Views of different kind of pages."""
+import asyncio
+import datetime
+import hashlib
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404, render
-from django.http import HttpResponseRedirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from .models import Choice, Question, Vote
 from django.urls import reverse
-from django.utils import timezone
-from django.http import JsonResponse
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.views.decorators.http import condition
+from . import (backends, cache, counters, events, exports, ingest, metrics, ratelimit, services, snapshots, streams,
+               timeline)
+from .decorators import cache_for_anonymous, gzip_response, staff_member_required, vary_on_cookie
 
 import logging
-from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
-from django.dispatch import receiver
 
 logger = logging.getLogger('polls')
 
 
-@receiver(user_logged_in)
-def user_logged_in_callback(sender, request, user, **kwargs):
-    # to cover more complex cases:
-    # http://stackoverflow.com/questions/4581789/how-do-i-get-user-ip-address-in-django
-    ip = request.META.get('REMOTE_ADDR')
-    logger.info(f"{user} logged in from {ip}")
+def index_stamp(request):
+    """Return the stamp of the list of questions."""
+    return cache.get_index_version()
 
-@receiver(user_logged_out)
-def user_logged_out_callback(sender, request, user, **kwargs):
-    ip = request.META.get('REMOTE_ADDR')
-    logger.info(f'logout user: {user} via ip: {ip}')
 
-@receiver(user_login_failed)
-def user_login_failed_callback(sender, credentials, request, **kwargs):
-    ip = request.META.get('REMOTE_ADDR')
-    logger.warning(f"Invalid login attempt for {credentials} from {ip}")
+def results_stamp(request, question_id):
+    """Return the stamp of the tallies of a question."""
+    return cache.get_version(question_id)
 
 
+def results_etag(request, question_id):
+    """Return the ETag of the tallies of a question."""
+    if settings.POLLS_VOTE_INGEST and request.user.is_authenticated:
+        # a voter may be shown their own vote before it is written
+        return None
+    return f'{question_id}-{cache.get_version(question_id)}'
+
+
+def result_data_etag(request, obj):
+    """Return the ETag of the tallies of a question in the negotiated format."""
+    etag = results_etag(request, obj)
+    return etag and f'{etag}-{exports.negotiate(request)}'
+
+
+def detail_stamp(request, question_id):
+    """Return (modified, is_open) of a question, loaded once per request."""
+    if not hasattr(request, '_polls_detail_stamp'):
+        request._polls_detail_stamp = (Question.objects.with_is_open().filter(pk=question_id)
+                                       .values_list('modified', 'is_open').first())
+    return request._polls_detail_stamp
+
+
+def detail_etag(request, question_id):
+    """Return the ETag of the voting form of an open question.
+
+    The form carries the CSRF token of the visitor, so the ETag covers
+    their session and CSRF cookies: a login cycles both, and a form kept
+    from before it would be refused. There is no Last-Modified, which
+    cannot tell them apart. The cookies are hashed, not read through.
+    """
+    stamp = detail_stamp(request, question_id)
+    if stamp and stamp[1]:
+        cookies = (request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+                   request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+        visitor = hashlib.md5(':'.join(cookies).encode()).hexdigest()[:16]
+        return f'{question_id}-{stamp[0].timestamp()}-{visitor}'
+    return None
+
 
 # Create your views here.
+@cache_for_anonymous(index_stamp)
 def index(request):
-    """Contain list of polls."""
-    latest_question_list = Question.objects.filter(pub_date__lte=timezone.now()).order_by('-pub_date')[::-1]
-    context = {'latest_question_list': latest_question_list}
+    """Contain list of polls, one page at a time from the oldest published."""
+    questions = Question.objects.published().with_is_open().order_by('pub_date', 'id')
+    open_only = request.GET.get('open') == '1'
+    if open_only:
+        questions = questions.open_for_voting()
+    after = decode_cursor(request.GET.get('after', ''))
+    if after:
+        pub_date, pk = after
+        questions = questions.filter(Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk))
+    # fetch one extra row to know whether there is a next page
+    page_size = settings.POLLS_INDEX_PAGE_SIZE
+    latest_question_list = list(questions[:page_size + 1])
+    next_cursor = None
+    if len(latest_question_list) > page_size:
+        latest_question_list = latest_question_list[:page_size]
+        next_cursor = encode_cursor(latest_question_list[-1])
+    context = {
+        'latest_question_list': latest_question_list,
+        'next_cursor': next_cursor,
+        'is_first_page': not after,
+        'open_only': open_only,
+    }
     return render(request, 'polls/index.html', context)
 
 
+def encode_cursor(question):
+    """Return the index page cursor pointing just after question."""
+    return urlsafe_base64_encode(f"{question.pub_date.isoformat()}|{question.id}".encode())
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) of an index page cursor, or None if it is not valid."""
+    try:
+        pub_date, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.datetime.fromisoformat(pub_date), int(pk)
+    except ValueError:
+        return None
+
+
+@vary_on_cookie
+@condition(etag_func=detail_etag)
 def detail(request, question_id):
     """Show detail of polls, handle when polls not able to vote."""
-    question = get_object_or_404(Question, pk=question_id)
-    if question.can_vote():
-        return render(request, 'polls/detail.html', {'question': question})
-    messages.error(request, "You try to access poll that does not allow")
-    return HttpResponseRedirect(reverse('polls:index'))
+    question = get_open_question(question_id)
+    if question is None:
+        messages.error(request, "You try to access poll that does not allow")
+        return HttpResponseRedirect(reverse('polls:index'))
+    context = {'question': question, 'cache_timeout': settings.POLLS_PAGE_CACHE_TIMEOUT}
+    return render(request, 'polls/detail.html', context)
+
+
+def get_open_question(question_id):
+    """Return the question if it is open for voting, or None if it is closed.
+
+    Raise Http404 if there is no such question.
+    """
+    question = Question.objects.open_for_voting().filter(pk=question_id).first()
+    if question is None and not Question.objects.filter(pk=question_id).exists():
+        raise Http404("No Question matches the given query.")
+    return question
 
 
+def live_stream(request, snapshot):
+    """Return whether the results page follows the counts over resultStream.
+
+    Only under ASGI can a stream stay open without holding a worker, and a
+    closed poll's counts no longer change.
+    """
+    return isinstance(request, ASGIRequest) and snapshot is None
+
+
+@condition(etag_func=results_etag)
+@cache_for_anonymous(results_stamp)
 def results(request, question_id):
-    """Show the results of polls."""
-    question = get_object_or_404(Question, pk=question_id)
-    return render(request, 'polls/results.html', {'question': question})
+    """Show the results of polls, from their snapshot once closed."""
+    question = get_object_or_404(Question.objects.select_related('snapshot'), pk=question_id)
+    stamp = cache.get_version(question.id)
+    snapshot = snapshots.for_question(question)
+    if snapshot is not None:
+        choices = snapshot.choices()
+    else:
+        choices = cache.get_results(question.id)
+        if settings.POLLS_VOTE_INGEST:
+            overlaid = ingest.overlay_pending(choices, request.user, question.id)
+            if overlaid is not choices:
+                choices, stamp = overlaid, f'{stamp}-{request.user.id}'
+    context = {
+        'question': question,
+        'choices': choices,
+        'snapshot': snapshot,
+        'live_stream': live_stream(request, snapshot),
+        'results_stamp': stamp,
+        'cache_timeout': settings.POLLS_PAGE_CACHE_TIMEOUT,
+    }
+    return render(request, 'polls/results.html', context)
 
 @login_required(login_url='/accounts/login/')
 def vote(request, question_id):
     """Make choice be able to vote."""
     user = request.user
-    # run this get_object_or_404 if fail return 404 page
-    question = get_object_or_404(Question, pk=question_id)
+    screened = ratelimit.screen_vote(request, question_id)
+    if screened is not None:
+        return screened
+    # run this get_open_question if fail return 404 page
+    question = get_open_question(question_id)
+    if question is None:
+        messages.error(request, "You try to vote in poll that does not allow")
+        return HttpResponseRedirect(reverse('polls:index'))
     try:
         choice_id = request.POST['choice']
         selected_choice = question.choice_set.get(pk=choice_id)
@@ -71,40 +194,136 @@ def vote(request, question_id):
         return render(request, 'polls/detail.html', {
             'question': question,
             'error_message': "You didn't select a choice.",
+            'cache_timeout': settings.POLLS_PAGE_CACHE_TIMEOUT,
         })
     else:
-        vote = get_vote_for_user(user, question)
-        # Always return an HttpResponseRedirect after successfully dealing
-        if not vote:
-            vote = Vote(user=user, choice=selected_choice)
+        if settings.POLLS_VOTE_INGEST:
+            ingest.get_queue().submit(user.id, question.id, selected_choice.id)
         else:
-            vote.choice = selected_choice
-        vote.save()
+            _, old_choice_id = services.cast_vote(user, question, selected_choice)
+            cache.refresh(question.id)
+            backends.publish_vote(question.id, counters.vote_deltas(selected_choice.id, old_choice_id))
+        ratelimit.remember_vote(user.id, question.id, selected_choice.id)
+        # Always return an HttpResponseRedirect after successfully dealing
         # with POST data. This prevents data from being posted twice if a
         # user hits the Back button.
         logger = logging.getLogger('polls')
-        logger.info(f'{user} vote {vote.choice} in question {question}')
+        logger.info(f'{user} vote {selected_choice} in question {question}')
         return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
 
 
 def get_vote_for_user(user_a, question):
-    try:
-        vote = Vote.objects.filter(user=user_a).filter(choice__question=question)
-        if vote.count() == 0:
-            return None
-        else:
-            return vote[0]
-    except Vote.DoesNotExist:
-        return None
+    """Return the vote of user_a in question, or None."""
+    return Vote.objects.filter(user=user_a, question=question).first()
 
 
+@gzip_response
+@condition(etag_func=result_data_etag)
 def resultData(request, obj):
-    """To return the data of that polls question."""
-    votedata = []
+    """To return the data of that polls question, in the format the client asks for."""
+    choices = cache.get_results(obj, loader=snapshots.get_results)
+    if choices is None:
+        raise Http404("No Question matches the given query.")
+    if settings.POLLS_VOTE_INGEST:
+        choices = ingest.overlay_pending(choices, request.user, obj)
+    return exports.results_response(choices, exports.negotiate(request))
+
+
+@gzip_response
+def timelineData(request, question_id):
+    """Return the vote timeline of a question (?since=&until=&points=) as compact arrays."""
+    question = get_object_or_404(Question, pk=question_id)
+    try:
+        since = exports.parse_bound(request.GET.get('since'))
+        until = exports.parse_bound(request.GET.get('until'))
+        points = int(request.GET.get('points', settings.POLLS_TIMELINE_POINTS))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    points = min(max(points, 1), settings.POLLS_TIMELINE_POINTS)
+    # fold the votes no consumer has read yet into the buckets first
+    events.catch_up_timeline()
+    return JsonResponse(timeline.get_timeline(question, since, until, points))
+
+
+@gzip_response
+def exportResults(request):
+    """Stream the results of every published question as NDJSON."""
+    return exports.stream_results()
+
+
+@staff_member_required
+def exportVotes(request):
+    """Stream the raw votes as CSV or NDJSON (?format=), optionally by question and date range."""
+    vote_format = request.GET.get('format', 'csv')
+    if vote_format not in exports.VOTE_FORMATS:
+        return HttpResponseBadRequest(f"format must be one of {', '.join(exports.VOTE_FORMATS)}")
+    try:
+        filters = exports.vote_filters(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return exports.stream_votes(vote_format, **filters)
+
+
+@staff_member_required
+def metricsData(request):
+    """Return the aggregated request metrics of this process."""
+    return JsonResponse(dict(metrics.registry.snapshot(), refused_votes=dict(ratelimit.rejections)))
+
+
+async def resultStream(request, question_id):
+    """Stream the vote counts of a question as server-sent events.
+
+    A snapshot event carries every choice with its count, then delta events
+    carry {choice_id: change} as votes come in on any node. Deltas come from
+    the shared broadcaster, so open streams add no database reads.
+
+    A WSGI worker cannot hold the stream open, so there only the snapshot
+    is sent and the browser reconnects after POLLS_STREAM_KEEPALIVE seconds.
+    """
+    if not isinstance(request, ASGIRequest):
+        choices = await sync_to_async(cache.get_results)(question_id, loader=snapshots.get_results)
+        if choices is None:
+            raise Http404("No Question matches the given query.")
+        return HttpResponse(f'retry: {settings.POLLS_STREAM_KEEPALIVE * 1000}\n\n'
+                            + sse_event('snapshot', snapshot_data(choices)),
+                            content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    # subscribe before reading the tallies, so no vote falls in between
+    queue = streams.broadcaster.subscribe(question_id)
+    choices = await sync_to_async(cache.get_results)(question_id, loader=snapshots.get_results)
+    if choices is None:
+        streams.broadcaster.unsubscribe(question_id, queue)
+        raise Http404("No Question matches the given query.")
+    response = StreamingHttpResponse(result_events(question_id, choices, queue), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def result_events(question_id, choices, queue):
+    """Yield server-sent events of the vote counts of a question."""
+    try:
+        yield sse_event('snapshot', snapshot_data(choices))
+        while True:
+            try:
+                deltas = await asyncio.wait_for(queue.get(), settings.POLLS_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if deltas is None:
+                # fell behind the broadcaster, start over from the cached tallies
+                choices = await sync_to_async(cache.get_results)(question_id)
+                yield sse_event('snapshot', snapshot_data(choices))
+            else:
+                yield sse_event('delta', deltas)
+    finally:
+        streams.broadcaster.unsubscribe(question_id, queue)
+
+
+def snapshot_data(choices):
+    """Return the snapshot event data of the tallies of a question."""
+    return exports.columnar(choices)
 
-    question = Question.objects.get(id=obj)
-    votes = question.choice_set.all()
 
-    for i in votes:
-        votedata.append({i.choice_text: i.votes})
-    return JsonResponse(votedata, safe=False)
+def sse_event(name, data):
+    """Format one server-sent event."""
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'